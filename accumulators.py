@@ -0,0 +1,162 @@
+import math
+from statistics import NormalDist
+
+
+def t_quantile(p: float, df: int) -> float:
+    """Get the quantile of Student's t-distribution with df degrees of freedom at probability p"""
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    # Cornish-Fisher expansion around the normal quantile
+    z = NormalDist().inv_cdf(p)
+    return (z
+            + (z ** 3 + z) / (4 * df)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+            + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * df ** 4))
+
+
+def batch_means_interval(batch_means: list[float], level: float = 0.95) -> tuple[float, float]:
+    """Get the mean of batch means and the half-width of its confidence interval at level"""
+    n = len(batch_means)
+    if n < 2:
+        return (batch_means[0] if batch_means else math.nan), math.inf
+    mean = sum(batch_means) / n
+    variance = sum((x - mean) ** 2 for x in batch_means) / (n - 1)
+    return mean, t_quantile((1 + level) / 2, n - 1) * math.sqrt(variance / n)
+
+
+class TimeWeightedStats:
+    """
+    Time-weighted statistics of values stored in vectors
+
+    A value is given by its vector and index, e.g. the marking vector of a compiled
+    net and the index of a place. The value must be observed before every change,
+    so only changes cost an update. Besides the mean and the variance, the mean over
+    every batch of batch_time is kept for batch means confidence intervals; when
+    max_batches are gathered adjacent batches are merged and batch_time doubles.
+    """
+    def __init__(self,
+                 values: list[tuple[list, int]],
+                 batch_time: float = 1.,
+                 max_batches: int = 40) -> None:
+        self.values = values
+        self.initial_batch_time = batch_time
+        self.max_batches = max_batches - max_batches % 2
+
+        n = len(values)
+        self.areas: list[float] = [0.] * n
+        self.squares: list[float] = [0.] * n
+        self.batch_areas: list[float] = [0.] * n
+        self.last: list[float] = [0.] * n
+        self.batch_means: list[list[float]] = [[] for _ in range(n)]
+        self.reset(0.)
+
+    def reset(self, now: float) -> None:
+        """Start gathering statistics from now"""
+        n = len(self.values)
+        self.start = now
+        self.areas[:] = [0.] * n
+        self.squares[:] = [0.] * n
+        self.last[:] = [now] * n
+        self._restart_batches(now)
+
+    def snapshot(self, now: float) -> tuple[list[float], list[float]]:
+        """Get time-weighted sums and sums of squares of every slot up to now"""
+        for slot in range(len(self.values)):
+            self.observe(slot, now)
+        return list(self.areas), list(self.squares)
+
+    def truncate(self, start: float, snapshot: tuple[list[float], list[float]], now: float) -> None:
+        """Discard statistics gathered before start given the snapshot taken at start"""
+        areas, squares = snapshot
+        for slot in range(len(self.values)):
+            self.observe(slot, now)
+            self.areas[slot] -= areas[slot]
+            self.squares[slot] -= squares[slot]
+        self.start = start
+        self._restart_batches(now)
+
+    def _restart_batches(self, now: float) -> None:
+        """Start batches of batch means from now"""
+        self.batch_start = now
+        self.batch_time = self.initial_batch_time
+        self.batch_end = now + self.batch_time
+        self.batch_areas[:] = [0.] * len(self.values)
+        for means in self.batch_means:
+            means.clear()
+
+    def state(self) -> dict:
+        """Get the gathered statistics without the observed vectors"""
+        return {
+            "start": self.start,
+            "areas": list(self.areas),
+            "squares": list(self.squares),
+            "batch_areas": list(self.batch_areas),
+            "last": list(self.last),
+            "batch_means": [list(means) for means in self.batch_means],
+            "batch_start": self.batch_start,
+            "batch_time": self.batch_time,
+            "batch_end": self.batch_end,
+        }
+
+    def restore(self, state: dict) -> None:
+        """Restore the statistics returned by state keeping the observed vectors"""
+        if len(state["areas"]) != len(self.values):
+            raise ValueError("statistics of a different number of values")
+        self.start = state["start"]
+        self.areas[:] = state["areas"]
+        self.squares[:] = state["squares"]
+        self.batch_areas[:] = state["batch_areas"]
+        self.last[:] = state["last"]
+        self.batch_means[:] = [list(means) for means in state["batch_means"]]
+        self.batch_start = state["batch_start"]
+        self.batch_time = state["batch_time"]
+        self.batch_end = state["batch_end"]
+
+    def observe(self, slot: int, now: float) -> None:
+        """Account the value of slot up to now, must be called before the value changes"""
+        vector, index = self.values[slot]
+        value = vector[index]
+        if value:
+            dt = now - self.last[slot]
+            self.areas[slot] += value * dt
+            self.squares[slot] += value * value * dt
+            self.batch_areas[slot] += value * dt
+        self.last[slot] = now
+
+    def advance(self, now: float) -> None:
+        """Close every batch ending not later than now"""
+        while self.batch_end <= now:
+            for slot in range(len(self.values)):
+                self.observe(slot, self.batch_end)
+                self.batch_means[slot].append(self.batch_areas[slot] / self.batch_time)
+                self.batch_areas[slot] = 0.
+            if len(self.batch_means[0]) >= self.max_batches:
+                for slot, means in enumerate(self.batch_means):
+                    self.batch_means[slot] = [(a + b) / 2 for a, b in zip(means[::2], means[1::2])]
+                self.batch_time *= 2
+            self.batch_end = self.batch_start + (len(self.batch_means[0]) + 1) * self.batch_time
+
+    def mean(self, slot: int, now: float) -> float:
+        """Get the time-weighted mean of slot up to now"""
+        elapsed = now - self.start
+        if not elapsed:
+            return 0.
+        vector, index = self.values[slot]
+        return (self.areas[slot] + vector[index] * (now - self.last[slot])) / elapsed
+
+    def variance(self, slot: int, now: float) -> float:
+        """Get the time-weighted variance of slot up to now"""
+        elapsed = now - self.start
+        if not elapsed:
+            return 0.
+        vector, index = self.values[slot]
+        value = vector[index]
+        squares = self.squares[slot] + value * value * (now - self.last[slot])
+        return max(squares / elapsed - self.mean(slot, now) ** 2, 0.)
+
+    def confidence_interval(self, slot: int, level: float = 0.95) -> tuple[float, float]:
+        """Get the batch means estimate of the mean of slot and the half-width of its confidence interval"""
+        return batch_means_interval(self.batch_means[slot], level)
@@ -0,0 +1,163 @@
+from typing import Any, Callable, Optional
+from elements import Place, Transition
+from model import Model
+from standard_model import StandardModel
+from extended_model import ExtendedModel
+from random_functions import Exponential, np
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+HORIZONS = [1_000, 10_000, 50_000]
+SIZES = [10, 100, 300]
+CYCLIC_EVENTS = 100_000
+
+
+def cyclic_net(stations: int) -> Model:
+    """
+    Build a closed cyclic queueing network of single-server stations
+
+    Every station has a line, a free server, a busy server and a counter of served
+    clients, half as many clients as stations circulate, so the net has 4 places and
+    2 transitions per station and its marking stays bounded.
+    """
+    lines = [Place(f'Line {i}', 1 if i % 2 == 0 else 0) for i in range(stations)]
+    ps, ts = list(lines), []
+    for i in range(stations):
+        free = Place(f'Server {i} free', 1)
+        busy = Place(f'Server {i} busy')
+        served = Place(f'Served by {i}')
+        start = Transition(f'Start {i}')
+        serve = Transition(f'Serve {i}', Exponential(1.))
+        start.add_inplace(lines[i])
+        start.add_inplace(free)
+        start.add_outplace(busy)
+        serve.add_inplace(busy)
+        serve.add_outplace(free)
+        serve.add_outplace(served)
+        serve.add_outplace(lines[(i + 1) % stations])
+        ps += [free, busy, served]
+        ts += [start, serve]
+    return Model(ps, ts)
+
+
+def measure(factory: Callable[[], Model], sim_time: float, repeat: int) -> dict[str, Any]:
+    """Measure construction and simulation of models built by factory taking medians over repeats"""
+    startups, walls, events = [], [], 0
+    for i in range(repeat):
+        start = time.perf_counter()
+        model = factory()
+        built = time.perf_counter()
+        model.simulate(sim_time, is_result=False, seed=i)
+        walls.append(time.perf_counter() - built)
+        startups.append(built - start)
+        events = model.events
+
+    tracemalloc.start()
+    factory().simulate(sim_time, is_result=False, seed=0)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    wall = statistics.median(walls)
+    return {
+        "sim_time": sim_time,
+        "events": events,
+        "wall_time": wall,
+        "events_per_second": events / wall if wall else 0.,
+        "startup_time": statistics.median(startups),
+        "peak_memory": peak,
+    }
+
+
+def import_time(repeat: int) -> float:
+    """Measure the median time of starting the interpreter and importing the engine"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import standard_model, extended_model'], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run(horizons: list[int], sizes: list[int], repeat: int = 3) -> dict[str, Any]:
+    """
+    Run the benchmark suite
+
+    Parameters
+    ----------
+    horizons : list[int]
+        simulation times of the bank models
+    sizes : list[int]
+        numbers of stations of synthetic cyclic nets, simulated for CYCLIC_EVENTS / stations units
+        of time, which gives about CYCLIC_EVENTS events regardless of the size
+    repeat : int
+        number of repeats of every benchmark
+
+    Returns
+    -------
+    dict[str, Any]
+        description of the machine and results of benchmarks by names
+    """
+    benchmarks: dict[str, tuple[Callable[[], Model], float]] = {}
+    for horizon in horizons:
+        benchmarks[f"standard-{horizon}"] = StandardModel, horizon
+        benchmarks[f"extended-{horizon}"] = ExtendedModel, horizon
+    for size in sizes:
+        benchmarks[f"cyclic-{size}"] = (lambda size=size: cyclic_net(size)), CYCLIC_EVENTS / size
+
+    results = {}
+    for name, (factory, sim_time) in benchmarks.items():
+        results[name] = measure(factory, sim_time, repeat)
+        print(name, f"{results[name]['events_per_second']:.0f} events/s", file=sys.stderr)
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "numpy": np.__version__ if np is not None else None,
+        "import_time": import_time(repeat),
+        "results": results,
+    }
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any]) -> dict[str, float]:
+    """Get speedups of events per second of benchmarks present in both reports"""
+    return {
+        name: result["events_per_second"] / baseline["results"][name]["events_per_second"]
+        for name, result in current["results"].items()
+        if name in baseline["results"] and baseline["results"][name]["events_per_second"]
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the suite from the command line printing or saving the json report"""
+    parser = argparse.ArgumentParser(description="Benchmark the simulation engine")
+    parser.add_argument('-o', '--output', help="json file to save the report into")
+    parser.add_argument('-b', '--baseline', help="json report of a previous run to compare with")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="number of repeats of every benchmark")
+    parser.add_argument('--quick', action='store_true', help="run only the shortest horizon and the smallest net")
+    args = parser.parse_args(argv)
+
+    report = run(HORIZONS[:1] if args.quick else HORIZONS, SIZES[:1] if args.quick else SIZES, args.repeat)
+    if args.baseline:
+        with open(args.baseline) as file:
+            report["speedup"] = compare(json.load(file), report)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+from typing import Callable, Optional
+from elements import Element, Place, Transition, Numeric
+from accumulators import TimeWeightedStats
+from random_functions import Constant
+import copy
+import random
+
+
+class CompiledNet:
+    """
+    Array-backed form of a Petri net built with Place and Transition
+
+    The marking and the loads of transitions are kept in flat vectors, the
+    places and transitions given are bound to them, so their n and load keep
+    reflecting the state of the compiled net. Pre and post incidence matrices
+    are stored as sparse rows of (place index, k) pairs per transition, as are
+    inhibitor arcs. Tokens a transition will output into places with capacity
+    are reserved at its input, so a place never exceeds its capacity.
+    """
+    def __init__(self, places: list[Place], transitions: list[Transition]) -> None:
+        places = list(places)
+        index = {p: i for i, p in enumerate(places)}
+        for t in transitions:
+            for p in (*t.inplaces, *t.outplaces, *t.inhibitors):
+                if p not in index:
+                    index[p] = len(places)
+                    places.append(p)
+
+        self.places: list[Place] = places
+        self.transitions: list[Transition] = list(transitions)
+
+        self.initial_marking: tuple[int, ...] = tuple(p.n for p in places)
+        self.marking: list[int] = [0] * len(places)
+        self.loads: list[int] = [0] * len(transitions)
+        for i, p in enumerate(places):
+            p.bind(self.marking, i)
+        for i, t in enumerate(transitions):
+            t.bind(self.loads, i)
+
+        self.pre: list[tuple[tuple[int, int], ...]] = [
+            tuple((index[p], k) for p, k in t.inplaces.items()) for t in transitions
+        ]
+        self.post: list[tuple[tuple[int, int], ...]] = [
+            tuple((index[p], k) for p, k in t.outplaces.items()) for t in transitions
+        ]
+        self.inhibitors: list[tuple[tuple[int, int], ...]] = [
+            tuple((index[p], k) for p, k in t.inhibitors.items()) for t in transitions
+        ]
+
+        self.capacity: list[float] = [p.capacity if p.capacity is not None else float('inf') for p in places]
+        self.reserved: list[int] = [0] * len(places)
+        self.reserve: list[tuple[tuple[int, int], ...]] = [
+            tuple((index[p], k) for p, k in t.outplaces.items() if p.capacity is not None) for t in transitions
+        ]
+        # change of the occupied room of bounded outplaces at input
+        self.room: list[tuple[tuple[int, int], ...]] = [
+            tuple((index[p], k - t.inplaces.get(p, 0)) for p, k in t.outplaces.items() if p.capacity is not None)
+            for t in transitions
+        ]
+        # places whose marking or reservations change at input
+        self.input_changes: list[tuple[tuple[int, int], ...]] = [
+            pre + reserve for pre, reserve in zip(self.pre, self.reserve)
+        ]
+        # transitions reserving room of every place with the tokens they reserve per firing
+        reservers: list[list[tuple[int, int]]] = [[] for _ in places]
+        for i, row in enumerate(self.reserve):
+            for p, k in row:
+                reservers[p].append((i, k))
+        self.reservers: list[tuple[tuple[int, int], ...]] = [tuple(row) for row in reservers]
+
+        # arcs into places of collapsed immediate transitions, tokens are routed at output
+        self.branches: list[tuple[tuple[int, int], ...]] = [() for _ in transitions]
+        self.routes: dict[int, tuple[list[int], list[float]]] = {}
+        # places whose marking may change at output
+        self.output_changes: list[tuple[tuple[int, int], ...]] = list(self.post)
+        self.rng: random.Random = random.Random()
+        self.priority: list[int] = [t.priority for t in transitions]
+        self.probability: list[float] = [t.probability for t in transitions]
+        self.delay: list[Callable[[], Numeric]] = [t.get_delay for t in transitions]
+        self.immediate: list[bool] = [
+            isinstance(t.get_delay, Constant) and t.get_delay.params[0] == 0 for t in transitions
+        ]
+        # places without consumers, like counters of served clients, only collect tokens
+        consumed = {p for row in (*self.pre, *self.inhibitors) for p, _ in row}
+        self.sinks: frozenset[int] = frozenset(
+            p for p, place in enumerate(places) if p not in consumed and place.capacity is None
+        )
+
+        dependents: list[set[int]] = [set() for _ in places]
+        for i in range(len(transitions)):
+            for p, _ in (*self.pre[i], *self.inhibitors[i], *self.reserve[i]):
+                dependents[p].add(i)
+        self.dependents: list[tuple[int, ...]] = [tuple(sorted(d)) for d in dependents]
+
+        self.stats: Optional[TimeWeightedStats] = None
+        self.slots: dict[Element, int] = {}
+        self._input_slots: list[tuple[int, ...]] = [() for _ in transitions]
+        self._output_slots: list[tuple[int, ...]] = [() for _ in transitions]
+
+    def clone(self, places: list[Place], transitions: list[Transition]) -> 'CompiledNet':
+        """
+        Get a net of the same structure in the initial marking over new elements
+
+        Incidence rows and other structure are shared with this net, places and
+        transitions must correspond to self.places and self.transitions in order.
+        """
+        net = copy.copy(self)
+        net.places, net.transitions = list(places), list(transitions)
+        net.marking = list(self.initial_marking)
+        net.loads = [0] * len(self.loads)
+        net.reserved = [0] * len(self.reserved)
+        for i, p in enumerate(net.places):
+            p.bind(net.marking, i)
+        for i, t in enumerate(net.transitions):
+            t.bind(net.loads, i)
+        net.delay = [t.get_delay for t in net.transitions]
+        net.stats = None
+        net.slots = {}
+        net._input_slots = [() for _ in net.transitions]
+        net._output_slots = [() for _ in net.transitions]
+        return net
+
+    def skeleton(self) -> 'CompiledNet':
+        """Get a copy of the structure of the net without elements, delay functions and statistics, e.g. to pickle"""
+        net = copy.copy(self)
+        net.places, net.transitions, net.delay = [], [], []
+        net.stats, net.slots = None, {}
+        return net
+
+    def track(self, elements: list[Element], batch_time: float = 1., max_batches: int = 40) -> TimeWeightedStats:
+        """
+        Gather time-weighted statistics of markings of the given places and loads of the given transitions
+
+        Parameters
+        ----------
+        elements : list[Element]
+            places and transitions of the net to track
+        batch_time : float
+            initial time of batches of the batch means
+        max_batches : int
+            number of batches at which adjacent batches are merged
+
+        Returns
+        -------
+        TimeWeightedStats
+            statistics whose slots are given by self.slots
+        """
+        place_index = {p: i for i, p in enumerate(self.places)}
+        transition_index = {t: i for i, t in enumerate(self.transitions)}
+
+        values = []
+        self.slots = {}
+        for e in elements:
+            self.slots[e] = len(values)
+            if isinstance(e, Place):
+                values.append((self.marking, place_index[e]))
+            else:
+                values.append((self.loads, transition_index[e]))
+
+        place_slots = {place_index[e]: slot for e, slot in self.slots.items() if isinstance(e, Place)}
+        load_slots = {transition_index[e]: slot for e, slot in self.slots.items() if isinstance(e, Transition)}
+        self._input_slots = [
+            tuple(place_slots[p] for p, _ in row if p in place_slots) + ((load_slots[i],) if i in load_slots else ())
+            for i, row in enumerate(self.pre)
+        ]
+        self._output_slots = [
+            tuple(place_slots[p] for p, _ in row if p in place_slots) + ((load_slots[i],) if i in load_slots else ())
+            for i, row in enumerate(self.output_changes)
+        ]
+
+        self.stats = TimeWeightedStats(values, batch_time, max_batches)
+        return self.stats
+
+    def enabled(self, i: int) -> bool:
+        """Check whether transition i is enabled"""
+        marking = self.marking
+        for p, k in self.pre[i]:
+            if marking[p] < k:
+                return False
+        for p, k in self.inhibitors[i]:
+            if marking[p] >= k:
+                return False
+        for p, k in self.room[i]:
+            if marking[p] + self.reserved[p] + k > self.capacity[p]:
+                return False
+        return True
+
+    def enabled_in(self, i: int, marking: tuple[int, ...], loads: tuple[int, ...]) -> bool:
+        """Check whether transition i is enabled in another state given by a marking and loads, which give reservations"""
+        for p, k in self.pre[i]:
+            if marking[p] < k:
+                return False
+        for p, k in self.inhibitors[i]:
+            if marking[p] >= k:
+                return False
+        for p, k in self.room[i]:
+            reserved = sum(loads[j] * kj for j, kj in self.reservers[p])
+            if marking[p] + reserved + k > self.capacity[p]:
+                return False
+        return True
+
+    def input(self, i: int, curr_t: float) -> float:
+        """Input markings of transition i once, return the time of the corresponding output"""
+        for slot in self._input_slots[i]:
+            self.stats.observe(slot, curr_t)
+        marking = self.marking
+        for p, k in self.pre[i]:
+            marking[p] -= k
+        for p, k in self.reserve[i]:
+            self.reserved[p] += k
+        self.loads[i] += 1
+        return curr_t + self.delay[i]()
+
+    def output(self, i: int, curr_t: float) -> None:
+        """Output markings of transition i once"""
+        for slot in self._output_slots[i]:
+            self.stats.observe(slot, curr_t)
+        marking = self.marking
+        for p, k in self.reserve[i]:
+            self.reserved[p] -= k
+        for p, k in self.post[i]:
+            marking[p] += k
+        for p, k in self.branches[i]:
+            for _ in range(k):
+                self._route(p)
+        self.loads[i] -= 1
+
+    def _route(self, p: int) -> None:
+        """Output a token put into place p by the immediate transition it is routed to"""
+        consumers, weights = self.routes[p]
+        j = consumers[0] if len(consumers) == 1 else self.rng.choices(consumers, weights)[0]
+        marking = self.marking
+        for q, k in self.post[j]:
+            marking[q] += k
+        for q, k in self.branches[j]:
+            for _ in range(k):
+                self._route(q)
+
+    def collapse_immediate(self, kept: set[Element]) -> list[int]:
+        """
+        Fuse free-choice immediate transitions into the transitions outputting into their places
+
+        A place is collapsed when it is initially empty, has no capacity, inhibits
+        nothing and every transition consuming it is an immediate transition taking
+        one token from it alone, without inhibitors and bounded outplaces, all of the
+        same priority. Such a place holds tokens for no time and every token leaves
+        it by one of its consumers chosen by their probabilities, so instead each
+        token is routed by that choice at the output that produces it. Neither kept
+        elements nor consumers of kept places are collapsed. Statistics must be
+        tracked again afterwards.
+
+        Parameters
+        ----------
+        kept : set[Element]
+            tracked elements and counters that must stay in the net
+
+        Returns
+        -------
+        list[int]
+            indices of collapsed transitions, never enabled afterwards
+        """
+        consumers: list[list[int]] = [[] for _ in self.places]
+        for i, row in enumerate(self.pre):
+            for p, _ in row:
+                consumers[p].append(i)
+        inhibiting = {p for row in self.inhibitors for p, _ in row}
+
+        def immediate(i: int) -> bool:
+            return (self.immediate[i] and len(self.pre[i]) == 1 and self.pre[i][0][1] == 1
+                    and not self.inhibitors[i] and not self.reserve[i] and self.transitions[i] not in kept)
+
+        routes = {}
+        for p, place in enumerate(self.places):
+            if (self.initial_marking[p] or place.capacity is not None or p in inhibiting or place in kept
+                    or not consumers[p] or not all(immediate(i) for i in consumers[p])
+                    or len({self.priority[i] for i in consumers[p]}) > 1):
+                continue
+            routes[p] = (consumers[p], [self.probability[i] for i in consumers[p]])
+        if not routes:
+            return []
+
+        self.routes = routes
+        self.branches = [tuple((p, k) for p, k in row if p in routes) for row in self.post]
+        self.post = [tuple((p, k) for p, k in row if p not in routes) for row in self.post]
+
+        def destinations(i: int, seen: frozenset) -> set[int]:
+            places = {p for p, _ in self.post[i]}
+            for p, _ in self.branches[i]:
+                if p not in seen:
+                    for j in routes[p][0]:
+                        places |= destinations(j, seen | {p})
+            return places
+
+        self.output_changes = [tuple((p, 0) for p in sorted(destinations(i, frozenset()))) for i in range(len(self.post))]
+        return sorted({i for consumers, _ in routes.values() for i in consumers})
+
+    def reset(self) -> None:
+        """Restore the initial marking and clear loads keeping the bound vectors"""
+        self.marking[:] = self.initial_marking
+        self.loads[:] = [0] * len(self.loads)
+        self.reserved[:] = [0] * len(self.reserved)
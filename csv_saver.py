@@ -1,14 +1,74 @@
-class CSVSaver:
-    """Class for using csv files"""
-    @staticmethod
-    def create_clear_file(filename: str) -> None:
-        """Create file, if not exist, else clear file"""
-        open(filename, 'w').close()
-
-    @staticmethod
-    def save(filename: str, data: list) -> None:
-        """Save data as a row appended to file"""
-        with open(filename, 'a') as f:
-            f.write(','.join([str(x) for x in list(data)]))
-            f.write('\n')
+import csv
+import io
+import threading
+import time
+from typing import Iterable, Optional
+from result_sink import ResultSink
 
+
+class CSVWriter(ResultSink):
+    """
+    Buffered writer of csv rows keeping the file open
+
+    Rows are kept in memory and written to the file when buffer_size rows are
+    buffered or flush_interval seconds passed since the last write, on flush
+    and on close. Used as a context manager the writer is closed, with the
+    buffered rows written, also when an exception is raised.
+    """
+    extension = 'csv'
+
+    def __init__(self,
+                 filename: str,
+                 header: Optional[Iterable[str]] = None,
+                 buffer_size: int = 1000,
+                 flush_interval: float = 5.,
+                 mode: str = 'w') -> None:
+        super().__init__(filename)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+
+        self._file = open(filename, mode, newline='')
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._rows = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        if header is not None:
+            self.write_header(header)
+
+    def write_header(self, header: Iterable[str]) -> None:
+        """Write the header row"""
+        self.write(header)
+        self.has_header = True
+
+    def write(self, data: Iterable) -> None:
+        """Buffer data as a row, write the buffer to the file if a threshold is reached"""
+        with self._lock:
+            self._writer.writerow(data)
+            self._rows += 1
+            if self._rows >= self.buffer_size or time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._flush()
+
+    def flush(self) -> None:
+        """Write buffered rows to the file"""
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        """Write buffered rows and close the file"""
+        with self._lock:
+            if self._file.closed:
+                return
+            try:
+                self._flush()
+            finally:
+                self._file.close()
+
+    def _flush(self) -> None:
+        self._file.write(self._buffer.getvalue())
+        self._file.flush()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._rows = 0
+        self._flushed_at = time.monotonic()
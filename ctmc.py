@@ -0,0 +1,216 @@
+from typing import Optional
+from compiled_net import CompiledNet
+from random_functions import Exponential
+
+
+class NotMarkovian(ValueError):
+    """Raised when a net can not be solved as a continuous-time Markov chain"""
+
+
+class SteadyState:
+    """Steady-state solution of a net, sinks of the net grow without bound so their throughputs are given instead of means"""
+    def __init__(self,
+                 marking: list[float],
+                 loads: list[float],
+                 throughputs: dict[int, float],
+                 states: int,
+                 iterations: int) -> None:
+        self.marking = marking
+        self.loads = loads
+        self.throughputs = throughputs
+        self.states = states
+        self.iterations = iterations
+
+
+class MeanValues:
+    """Constant means of slots of statistics, standing in for TimeWeightedStats"""
+    def __init__(self, values: list[float]) -> None:
+        self.values = values
+
+    def mean(self, slot: int, now: float) -> float:
+        return self.values[slot]
+
+
+class CTMC:
+    """
+    Continuous-time Markov chain of a net whose timed transitions are exponential
+
+    States are the marking and loads of transitions after every immediate
+    transition has fired, immediate transitions have Constant(0) delays and fire
+    in the order of the simulation: every enabled transition is input resolving
+    conflicts by priority and probability, then outputs of immediate transitions
+    are made together, until nothing is enabled and no immediate transition is
+    loaded. Every firing of a timed transition completes independently, so a
+    transition with load k completes at k times its rate.
+    """
+    def __init__(self, net: CompiledNet, max_states: int = 100_000) -> None:
+        self.net = net
+        self.max_states = max_states
+
+        self.rates: list[Optional[float]] = []
+        for i, t in enumerate(net.transitions):
+            if net.immediate[i]:
+                self.rates.append(None)
+            elif isinstance(t.get_delay, Exponential):
+                self.rates.append(1 / t.get_delay.params[0])
+            else:
+                raise NotMarkovian(f"delay {t.get_delay!r} of transition {t.name} is neither exponential nor zero")
+
+        self.outputs = [net.post[i] + net.branches[i] for i in range(len(net.transitions))]
+        self.sinks = sorted(net.sinks)
+        self._sink_index = {p: j for j, p in enumerate(self.sinks)}
+        self._settled: dict[tuple, tuple[dict[tuple, float], list[float]]] = {}
+
+    def solve(self, tolerance: float = 1e-12, max_iterations: int = 100_000) -> SteadyState:
+        """
+        Build the reachability graph of tangible states and solve the steady state with Gauss-Seidel iterations
+
+        Parameters
+        ----------
+        tolerance : float
+            largest change of a state probability between iterations at convergence
+        max_iterations : int
+            number of iterations after which the last approximation is taken
+
+        Returns
+        -------
+        SteadyState
+            mean marking of places, mean loads of transitions and throughputs of sink places
+        """
+        net = self.net
+        places = len(net.places)
+        marking = list(net.initial_marking)
+        for p in self.sinks:
+            marking[p] = 0
+        initial, _ = self._settle(tuple(marking), (0,) * len(net.transitions))
+
+        index: dict[tuple, int] = {}
+        states: list[tuple] = []
+        for state in initial:
+            index[state] = len(states)
+            states.append(state)
+
+        incoming: list[list[tuple[int, float]]] = []
+        out_rates: list[float] = []
+        deposits: list[list[float]] = []
+        s = 0
+        while s < len(states):
+            state = states[s]
+            out_rate, deposit = 0., [0.] * len(self.sinks)
+            for i, rate in enumerate(self.rates):
+                load = state[places + i]
+                if rate is None or not load:
+                    continue
+                rate *= load
+                marking, loads = list(state[:places]), list(state[places:])
+                gained = self._output(i, marking, loads)
+                targets, settle_deposit = self._settle(tuple(marking), tuple(loads))
+                for j in range(len(deposit)):
+                    deposit[j] += rate * (gained[j] + settle_deposit[j])
+                for target, probability in targets.items():
+                    if target not in index:
+                        if len(states) >= self.max_states:
+                            raise NotMarkovian(f"more than {self.max_states} tangible states")
+                        index[target] = len(states)
+                        states.append(target)
+                    if target != state:
+                        out_rate += rate * probability
+                        _add_arc(incoming, index[target], s, rate * probability)
+            out_rates.append(out_rate)
+            deposits.append(deposit)
+            s += 1
+
+        if any(not rate for rate in out_rates):
+            raise NotMarkovian("the net has dead markings")
+
+        n = len(states)
+        incoming.extend([] for _ in range(n - len(incoming)))
+        pi = [1 / n] * n
+        for iterations in range(1, max_iterations + 1):
+            change = 0.
+            for j in range(n):
+                value = sum(pi[i] * rate for i, rate in incoming[j]) / out_rates[j]
+                change = max(change, abs(value - pi[j]))
+                pi[j] = value
+            total = sum(pi)
+            pi = [x / total for x in pi]
+            if change / total < tolerance:
+                break
+
+        means = [0.] * len(states[0])
+        for probability, state in zip(pi, states):
+            for k, value in enumerate(state):
+                if value:
+                    means[k] += probability * value
+        throughputs = {p: sum(pi[s] * deposits[s][j] for s in range(n)) for j, p in enumerate(self.sinks)}
+        return SteadyState(means[:places], means[places:], throughputs, n, iterations)
+
+    def _settle(self, marking: tuple, loads: tuple) -> tuple[dict[tuple, float], list[float]]:
+        """Get probabilities of tangible states reached from a state and expected tokens put into sinks on the way"""
+        key = marking + loads
+        if key in self._settled:
+            return self._settled[key]
+
+        net = self.net
+        enabled = [i for i in range(len(loads)) if net.enabled_in(i, marking, loads)]
+        outcomes: dict[tuple, float] = {}
+        deposit = [0.] * len(self.sinks)
+        if enabled:
+            maximum = max(net.priority[i] for i in enabled)
+            enabled = [i for i in enabled if net.priority[i] == maximum]
+            total = sum(net.probability[i] for i in enabled)
+            for i in enabled:
+                probability = net.probability[i] / total if len(enabled) > 1 else 1.
+                if not probability:
+                    continue
+                next_marking, next_loads = list(marking), list(loads)
+                for p, k in net.pre[i]:
+                    next_marking[p] -= k
+                next_loads[i] += 1
+                self._merge(outcomes, deposit, probability, self._settle(tuple(next_marking), tuple(next_loads)))
+        elif any(loads[i] and self.rates[i] is None for i in range(len(loads))):
+            next_marking, next_loads = list(marking), list(loads)
+            gained = [0.] * len(self.sinks)
+            for i, load in enumerate(loads):
+                if load and self.rates[i] is None:
+                    for _ in range(load):
+                        for j, k in enumerate(self._output(i, next_marking, next_loads)):
+                            gained[j] += k
+            self._merge(outcomes, deposit, 1., self._settle(tuple(next_marking), tuple(next_loads)))
+            for j, k in enumerate(gained):
+                deposit[j] += k
+        else:
+            outcomes[key] = 1.
+
+        self._settled[key] = outcomes, deposit
+        return outcomes, deposit
+
+    @staticmethod
+    def _merge(outcomes: dict[tuple, float],
+               deposit: list[float],
+               probability: float,
+               settled: tuple[dict[tuple, float], list[float]]) -> None:
+        """Add outcomes of a branch taken with probability"""
+        targets, branch_deposit = settled
+        for target, p in targets.items():
+            outcomes[target] = outcomes.get(target, 0.) + probability * p
+        for j, k in enumerate(branch_deposit):
+            deposit[j] += probability * k
+
+    def _output(self, i: int, marking: list, loads: list) -> list[int]:
+        """Output transition i once in place, get tokens put into sinks"""
+        gained = [0] * len(self.sinks)
+        loads[i] -= 1
+        for p, k in self.outputs[i]:
+            if p in self._sink_index:
+                gained[self._sink_index[p]] += k
+            else:
+                marking[p] += k
+        return gained
+
+
+def _add_arc(incoming: list[list[tuple[int, float]]], target: int, source: int, rate: float) -> None:
+    """Add a rate from source to target, incoming is extended up to the target as targets are found"""
+    while len(incoming) <= target:
+        incoming.append([])
+    incoming[target].append((source, rate))
@@ -0,0 +1,222 @@
+from typing import Callable, Optional
+from elements import Place
+from compiled_net import CompiledNet
+from random_functions import Distribution, RandomFunctions, np
+import random
+
+
+INF = float('inf')
+
+
+class Lockstep:
+    """
+    Engine advancing n replications of a compiled net at once with NumPy
+
+    Markings, reservations of bounded places and loads of the replications are
+    rows of one 2-D array, pending events are rows of an array of output times with
+    the transitions they belong to, doubled when a replication has no free column.
+    Every step performs the input round of every replication, each round inputs
+    one transition per replication chosen by priority and probability, then moves
+    every replication to its own next event time and outputs all its events due
+    then, as Model does. Which transitions are enabled is kept in an array and after
+    an input or output recalculated only for the transitions whose arcs read the
+    changed columns. Delays are taken from buffers of every transition drawn in
+    batches, so a step costs a fixed number of array operations however many
+    replications there are.
+    """
+    def __init__(self, net: CompiledNet, n: int, counters: list[Place], seed: Optional[int] = None) -> None:
+        if np is None:
+            raise ImportError("NumPy is required to run replications in lockstep")
+        if net.routes:
+            raise ValueError("nets with collapsed immediate transitions can not be run in lockstep")
+
+        self.net = net
+        self.n = n
+        places, transitions = len(net.places), len(net.transitions)
+        # changes of marking, reservations and loads, the columns of the state
+        loads = np.eye(transitions) * -1
+        self.pre = np.hstack((_dense(net.pre, places), _dense(net.reserve, places) * -1, loads))
+        self.post = np.hstack((_dense(net.post, places), _dense(net.reserve, places) * -1, loads))
+        # a transition is chosen by the greatest key, its level of priority plus u ** (1 / probability)
+        # with u uniform in [0, 1), which picks transitions of the highest priority in proportion to
+        # their probabilities and the first of them when all probabilities are 0
+        self._level = np.unique(net.priority, return_inverse=True)[1].astype(float)
+        probability = np.array(net.probability, dtype=float)
+        exponent = np.divide(1., probability, out=np.full(transitions, INF), where=probability > 0)
+        self._weighted = np.flatnonzero(exponent != 1)
+        self._exponent = exponent[self._weighted]
+
+        # every arc gives a linear function of the state that must reach its threshold
+        arcs = ([(i, [(p, 1.)], k) for i, row in enumerate(net.pre) for p, k in row]
+                + [(i, [(p, -1.)], 1 - k) for i, row in enumerate(net.inhibitors) for p, k in row]
+                + [(i, [(p, -1.), (places + p, -1.)], k - net.capacity[p]) for i, row in enumerate(net.room) for p, k in row])
+        self._arcs = np.zeros((2 * places + transitions, len(arcs)))
+        self._thresholds = np.array([threshold for _, _, threshold in arcs], dtype=float)
+        self._belong = np.zeros((len(arcs), transitions))
+        for a, (i, terms, _) in enumerate(arcs):
+            for column, coefficient in terms:
+                self._arcs[column, a] = coefficient
+            self._belong[a, i] = 1.
+
+        # transitions whose enabling may change by an input or output of every transition
+        reads = (self._arcs != 0) @ self._belong > 0
+        self._affected_by_input = (self.pre != 0) @ reads > 0
+        self._affected_by_output = (self.post != 0) @ reads > 0
+        self._subsets: dict[bytes, tuple['np.ndarray', 'np.ndarray', 'np.ndarray', 'np.ndarray']] = {}
+
+        index = {p: i for i, p in enumerate(net.places)}
+        self.counters = [index[p] for p in counters]
+        self.state = np.zeros((n, 2 * places + transitions))
+        self.state[:, :places] = net.initial_marking
+        self.marking = self.state[:, :places]
+        self.loads = self.state[:, 2 * places:]
+        self.curr_t = np.zeros(n)
+        self.times = np.full((n, max(transitions, 4)), INF)
+        self.fired = np.zeros((n, max(transitions, 4)), dtype=np.int64)
+        self.enabled = self._check(self.state, self._arcs, self._thresholds, self._belong)
+
+        self.generator = np.random.default_rng(seed)
+        base = seed if seed is not None else int(self.generator.integers(2 ** 63))
+        self.delay: list[Callable[[int], 'np.ndarray']] = []
+        for t in net.transitions:
+            delay = t.get_delay
+            if isinstance(delay, Distribution):
+                self.delay.append(delay.bind(random.Random(RandomFunctions.derive_seed(base, t.name))).batch)
+            else:
+                self.delay.append(lambda size, delay=delay: np.array([delay() for _ in range(size)], dtype=float))
+        # every replication takes delays of a transition from its own row of the transition's buffer
+        self._size = max(16, 2 ** 14 // n)
+        self._buffer = np.array([delay(n * self._size) for delay in self.delay]).reshape(transitions, n, self._size)
+        self._used = np.zeros((transitions, n), dtype=np.int64)
+
+        slots = sorted(net.slots, key=net.slots.get)
+        transition_index = {t: i for i, t in enumerate(net.transitions)}
+        self._place_slots = [s for s, e in enumerate(slots) if isinstance(e, Place)]
+        self._place_columns = [index[e] for e in slots if isinstance(e, Place)]
+        self._load_slots = [s for s, e in enumerate(slots) if not isinstance(e, Place)]
+        self._load_columns = [2 * places + transition_index[e] for e in slots if not isinstance(e, Place)]
+
+    def run(self, sim_time: float, warmup_time: float = 0) -> tuple['np.ndarray', 'np.ndarray']:
+        """
+        Simulate the replications with the given warmup and simulation time
+
+        Parameters
+        ----------
+        sim_time : float
+            time of simulation after warmup
+        warmup_time : float
+            time of warmup after which statistics start and counters are cleared
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            time-weighted means of tracked elements by slots and final markings, a row per replication
+        """
+        if warmup_time:
+            self._advance(warmup_time)
+            self.marking[:, self.counters] = 0
+            self.enabled = self._check(self.state, self._arcs, self._thresholds, self._belong)
+        start = self.curr_t.copy()
+        area = np.zeros(self.state.shape)
+        self._advance(warmup_time + sim_time, area)
+        means = np.empty((self.n, len(self.net.slots)))
+        means[:, self._place_slots] = area[:, self._place_columns]
+        means[:, self._load_slots] = area[:, self._load_columns]
+        return means / (self.curr_t - start)[:, None], self.marking.round().astype(np.int64)
+
+    def _advance(self, end: float, area: Optional['np.ndarray'] = None) -> None:
+        """Simulate every replication until its current time reaches end, accumulating areas under the state"""
+        active = self.curr_t < end
+        while active.any():
+            self._input(np.flatnonzero(active & self.enabled.any(1)))
+            next_t = self.times.min(1)
+            # a replication with nothing scheduled keeps its state to the end
+            next_t = np.where(active, np.minimum(next_t, end), self.curr_t)
+            if area is not None:
+                area += self.state * (next_t - self.curr_t)[:, None]
+            self.curr_t = next_t
+            self._output()
+            active &= self.curr_t < end
+
+    def _input(self, rows: 'np.ndarray') -> None:
+        """Input enabled transitions of the given replications until none is enabled"""
+        while rows.size:
+            keys = self.generator.random((rows.size, len(self._level)))
+            if self._weighted.size:
+                keys[:, self._weighted] **= self._exponent
+            keys += self._level
+            choice = np.where(self.enabled[rows], keys, -INF).argmax(1)
+
+            self.state[rows] -= self.pre[choice]
+            self._schedule(rows, choice, self.curr_t[rows] + self._draw(rows, choice))
+            self._update(rows, self._affected_by_input[choice].any(0))
+            rows = rows[self.enabled[rows].any(1)]
+
+    def _draw(self, rows: 'np.ndarray', transitions: 'np.ndarray') -> 'np.ndarray':
+        """Take a delay of a transition for every given replication from the buffers, refilling the buffers running out"""
+        used = self._used[transitions, rows]
+        exhausted = used == self._size
+        if exhausted.any():
+            # the unused delays of other replications are dropped, they are independent of the refill
+            for i in np.unique(transitions[exhausted]).tolist():
+                self._buffer[i] = self.delay[i](self.n * self._size).reshape(self.n, self._size)
+                self._used[i] = 0
+            used = self._used[transitions, rows]
+        self._used[transitions, rows] = used + 1
+        return self._buffer[transitions, rows, used]
+
+    def _update(self, rows: Optional['np.ndarray'], affected: 'np.ndarray') -> None:
+        """Recalculate which of the affected transitions given by a mask are enabled in the given replications, all when None"""
+        key = affected.tobytes()
+        subset = self._subsets.get(key)
+        if subset is None:
+            columns = np.flatnonzero(affected)
+            arcs = np.flatnonzero(self._belong[:, columns].any(1))
+            subset = self._subsets[key] = (columns, self._arcs[:, arcs], self._thresholds[arcs], self._belong[np.ix_(arcs, columns)])
+        columns, *matrices = subset
+        if not columns.size:
+            return
+        if rows is None:
+            self.enabled[:, columns] = self._check(self.state, *matrices)
+        else:
+            self.enabled[rows[:, None], columns] = self._check(self.state[rows], *matrices)
+
+    @staticmethod
+    def _check(state: 'np.ndarray', arcs: 'np.ndarray', thresholds: 'np.ndarray', belong: 'np.ndarray') -> 'np.ndarray':
+        """Get which transitions are enabled in states as rows given their arcs, thresholds of arcs and transitions arcs belong to"""
+        return (state @ arcs < thresholds) @ belong == 0
+
+    def _schedule(self, rows: 'np.ndarray', transitions: 'np.ndarray', times: 'np.ndarray') -> None:
+        """Add an event of output of a transition at a time to every given replication"""
+        free = self.times[rows] == INF
+        if not free.any(1).all():
+            # double the calendar of all replications
+            columns = self.times.shape[1]
+            self.times = np.hstack((self.times, np.full((self.n, columns), INF)))
+            self.fired = np.hstack((self.fired, np.zeros((self.n, columns), dtype=np.int64)))
+            free = self.times[rows] == INF
+        slots = free.argmax(1)
+        self.times[rows, slots] = times
+        self.fired[rows, slots] = transitions
+
+    def _output(self) -> None:
+        """Output every event due at the current time of its replication, finished replications have none"""
+        rows, slots = np.nonzero(self.times == self.curr_t[:, None])
+        if not rows.size:
+            return
+        transitions = self.loads.shape[1]
+        fired = self.fired[rows, slots]
+        counts = np.bincount(rows * transitions + fired, minlength=self.n * transitions)
+        counts = counts.reshape(self.n, transitions).astype(float)
+        self.times[rows, slots] = INF
+        self.state += counts @ self.post
+        self._update(None, self._affected_by_output[fired].any(0))
+
+
+def _dense(rows: list[tuple[tuple[int, int], ...]], places: int) -> 'np.ndarray':
+    """Get the dense matrix of sparse rows of (place index, k) pairs"""
+    matrix = np.zeros((len(rows), places))
+    for i, row in enumerate(rows):
+        for p, k in row:
+            matrix[i, p] += k
+    return matrix
@@ -1,8 +1,33 @@
 from standard_model import StandardModel
 from extended_model import ExtendedModel
 from elements import Numeric
-from random_functions import RandomFunctions as rf
-from csv_saver import CSVSaver
+from random_functions import Constant, Distribution, Exponential, Normal, Triangular, Uniform
+from csv_saver import CSVWriter
+from result_sink import ResultSink
+from parallel_runner import ParallelRunner
+from sweep import Sweep, defaults, one_at_a_time
+from state_space import explore
+from functools import partial
+from typing import Any, Callable, Optional
+
+
+def _scaled(value: Any, factor: float) -> Any:
+    """Get the parameter with its number scaled, the mode of a triangular and the first parameter of other distributions"""
+    if isinstance(value, Triangular):
+        low_t, high_t, mode_t = value.params
+        return Triangular(low_t, high_t, _scaled(mode_t, factor))
+    if isinstance(value, Distribution):
+        return type(value)(_scaled(value.params[0], factor), *value.params[1:])
+    return int(value * factor) if isinstance(value, int) else value * factor
+
+
+def _number(value: Any) -> Numeric:
+    """Get the number of a parameter varied by _scaled"""
+    if isinstance(value, Triangular):
+        return value.params[2]
+    if isinstance(value, Distribution):
+        return value.params[0]
+    return value
 
 
 class Experiment:
@@ -17,71 +42,94 @@ class Experiment:
         return ExtendedModel().simulate(time)
 
     @staticmethod
-    def verify(time: Numeric) -> None:
-        """Perform model verification saving results to verification.csv"""
-        PARAMS = [
-            3, 4, 7, 0.5, 0.6, 0.4, 2, 0.75, 0.5, 60
-        ]
-        params = list(PARAMS)
-        print("Params", params)
-        CSVSaver.save("verification.csv", params + list(Experiment.run_params(time, params).values()))
-        for i in range(len(params)):
-            params = list(PARAMS)
-            if i < 3:
-                params[i] = params[i] / 3 if isinstance(params[i], float) else params[i] // 3
-            else:
-                params[i] = params[i] / 2 if isinstance(params[i], float) else params[i] // 2
-            print("Params", params)
-            CSVSaver.save("verification.csv", params + list(Experiment.run_params(time, params).values()))
-
-            params = list(PARAMS)
-            if i < 3:
-                params[i] *= 3
-            else:
-                params[i] *= 2
-            print("Params", params)
-            CSVSaver.save("verification.csv", params + list(Experiment.run_params(time, params).values()))
+    def verify(time: Numeric, workers: Optional[int] = None) -> None:
+        """Perform model verification varying one parameter at a time and saving results to verification.csv"""
+        base = defaults(StandardModel)
+        levels = {
+            name: [_scaled(value, 1 / 3), _scaled(value, 3)] if i < 3 else [_scaled(value, 1 / 2), _scaled(value, 2)]
+            for i, (name, value) in enumerate(base.items())
+        }
+        points = one_at_a_time(base, levels)
+
+        results = Sweep(StandardModel, time, workers=workers).run(points)
+        with CSVWriter("verification.csv", mode='a') as writer:
+            for point, result in zip(points, results):
+                print("Params", point)
+                writer.write([_number(value) for value in point.values()] + list(result.values()))
 
     @staticmethod
-    def run_intervals(sim_time: Numeric, warmup_time: Numeric, interval: Numeric, name: str) -> None:
+    def run_intervals(sim_time: Numeric,
+                      warmup_time: Numeric,
+                      interval: Numeric,
+                      name: str,
+                      workers: Optional[int] = None,
+                      sink: type[ResultSink] = CSVWriter) -> None:
         """Run model outputing and saving stats every interval time"""
-        for i in range(21):
-            ExtendedModel().simulate_intervals(sim_time, interval, warmup_time, f'{name}-{i}')
+        ParallelRunner(workers).replicate_intervals(ExtendedModel, 21, sim_time, interval, warmup_time, name, sink)
 
     @staticmethod
-    def experiment(sim_time: Numeric, warmup_time: Numeric) -> None:
-        """Run model simulations 20 times and save the results into standard.csv and extended.csv files"""
-        for i in range(1, 21):
-            CSVSaver.save("standard.csv", [i] + list(StandardModel().simulate(sim_time, warmup_time, False).values()))
-        for i in range(1, 21):
-            CSVSaver.save("extended.csv", [i] + list(ExtendedModel().simulate(sim_time, warmup_time, False).values()))
+    def experiment(sim_time: Numeric, warmup_time: Numeric, workers: Optional[int] = None) -> None:
+        """Run model simulations 20 times from a shared warmup and save the results into standard.csv and extended.csv files"""
+        runner = ParallelRunner(workers)
+        with CSVWriter("standard.csv", mode='a') as writer:
+            for i, result in enumerate(runner.replicate(StandardModel, 20, sim_time, warmup_time, warm_start=True), 1):
+                writer.write([i] + list(result.values()))
+        with CSVWriter("extended.csv", mode='a') as writer:
+            for i, result in enumerate(runner.replicate(ExtendedModel, 20, sim_time, warmup_time, warm_start=True), 1):
+                writer.write([i] + list(result.values()))
 
     @staticmethod
     def run_improved_standard(sim_time: Numeric, warmup_time: Numeric = 0):
-        StandardModel(indoors_cashier_delay_time=lambda:0, indoors_cashiers=3).simulate(sim_time, warmup_time, False)
+        StandardModel(indoors_cashier_delay_time=Constant(0), indoors_cashiers=3).simulate(sim_time, warmup_time, False)
 
     @staticmethod
     def run_improved_extended(sim_time: Numeric, warmup_time: Numeric = 0):
-        ExtendedModel(indoors_cashier_delay_time=lambda:0, indoors_cashiers=3).simulate(sim_time, warmup_time, False)
+        ExtendedModel(indoors_cashier_delay_time=Constant(0), indoors_cashiers=3).simulate(sim_time, warmup_time, False)
+
+    @staticmethod
+    def compare_improved(sim_time: Numeric, warmup_time: Numeric = 0, n: int = 20, workers: Optional[int] = None) -> None:
+        """Print differences of the improved models from the original ones over n pairs of runs on common random numbers"""
+        runner = ParallelRunner(workers)
+        for model in (StandardModel, ExtendedModel):
+            improved = partial(model, indoors_cashier_delay_time=Constant(0), indoors_cashiers=3)
+            print(f"-------------{model.__name__} IMPROVEMENT---------------")
+            for k, (difference, half_width) in runner.compare(model, improved, n, sim_time, warmup_time).items():
+                print(k, '=', difference, '±', half_width)
+
+    @staticmethod
+    def check_state_spaces(capacities: list[int], workers: int = 1) -> None:
+        """Explore the standard model with given indoors line capacities printing sizes of state spaces and defects"""
+        for capacity in capacities:
+            space = explore(StandardModel(indoors_line_capacity=capacity), workers=workers)
+            unbounded = space.unbounded_places + space.unbounded_transitions
+            print(f"Indoors line capacity {capacity}: {space.states} states{'' if space.complete else ' explored'},",
+                  f"{space.dead} dead,", f"unbounded {unbounded}" if unbounded else "bounded")
 
     @staticmethod
     def run_params(time: Numeric, params: list) -> dict[str, float]:
         """Run model with given params list"""
-        return StandardModel(
+        return Experiment.params_factory(params)().simulate(time, is_protocol=False)
+
+    @staticmethod
+    def params_factory(params: list) -> Callable[[], StandardModel]:
+        """Get picklable factory of the standard model with given params list"""
+        return partial(
+            StandardModel,
             first_auto_line_capacity = params[0],
             second_auto_line_capacity = params[1],
             indoors_line_capacity = params[2],
-            first_cashier_time = lambda: rf.normal(params[3], 0.25),
-            second_cashier_time = lambda: rf.uniform(params[4], 0.4),
-            indoors_cashier_time = lambda: rf.triang(0.1, 1.2, params[5]),
+            first_cashier_time = Normal(params[3], 0.25),
+            second_cashier_time = Uniform(params[4], 0.4),
+            indoors_cashier_time = Triangular(0.1, 1.2, params[5]),
             indoors_cashiers = params[6],
-            auto_generator_time = lambda: rf.exponential(params[7]),
-            indoors_generator_time = lambda: rf.exponential(params[8]),
-            indoors_cashier_delay_time = lambda: params[9]
-        ).simulate(time, is_protocol=False)
+            auto_generator_time = Exponential(params[7]),
+            indoors_generator_time = Exponential(params[8]),
+            indoors_cashier_delay_time = Constant(params[9])
+        )
 
     @staticmethod
     def main() -> None:
+        Experiment.check_state_spaces([7, 10, 15, 20])
         Experiment.run_standard(1000)
         Experiment.run_extended(1000)
 
@@ -92,6 +140,7 @@ class Experiment:
         Experiment.experiment(15000, 2500)
         Experiment.run_improved_standard(15_000)
         Experiment.run_improved_extended(15_000)
+        Experiment.compare_improved(15_000, 2500)
 
 
 if __name__ == '__main__':
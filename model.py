@@ -1,34 +1,128 @@
-from typing import Optional
-from elements import Place, Transition, Numeric
+from typing import Any, Callable, Iterable, Iterator, Optional
+from elements import Element, Place, Transition, Numeric
+from compiled_net import CompiledNet
+from random_functions import Distribution, RandomFunctions
+from accumulators import batch_means_interval
+from warmup import mser
+from protocol import Protocol
+from profiler import Profiler
+from ctmc import CTMC, MeanValues, NotMarkovian
+from lockstep import Lockstep
+import heapq
+import itertools
+import os
+import pickle
 import random
-from csv_saver import CSVSaver
+import time
+import warnings
+import zlib
+from result_sink import ResultSink
+from csv_saver import CSVWriter
+
+
+INF = float('inf')
 
 
 class Model:
     """Petri net model"""
-    def __init__(self, places: list[Place], transitions: list[Transition]) -> None:
+    def __init__(self,
+                 places: list[Place],
+                 transitions: list[Transition],
+                 tracked: Optional[list[Element]] = None,
+                 counters: Optional[list[Place]] = None,
+                 net: Optional[CompiledNet] = None,
+                 results: Optional[dict[str, Callable[['Model'], float]]] = None) -> None:
+        """
+        Parameters
+        ----------
+        places : list[Place]
+            places of the net
+        transitions : list[Transition]
+            transitions of the net
+        tracked : Optional[list[Element]]
+            elements whose mean marking or load is reported, every element when None
+        counters : Optional[list[Place]]
+            places counting tokens the reported values are calculated from, cleared after warmup
+        net : Optional[CompiledNet]
+            compiled net of the places and transitions, e.g. a clone of a template's net, compiled when None
+        results : Optional[dict[str, Callable[[Model], float]]]
+            functions of the model giving the reported values by names, means of tracked elements and markings when None
+        """
         self.ps = places
         self.ts = transitions
         self.curr_t, self.next_t = 0., 0.
 
+        self.net = net if net is not None else CompiledNet(places, transitions)
+        self.stats = self.net.track(tracked if tracked is not None else transitions + places)
+        self.counters = counters if counters is not None else []
+        self.results = results
+        self.detected_warmup_time: Optional[float] = None
+
+        self._enabled: set[int] = set()
+        self._refresh_enabled()
+
+        self._events: list[tuple[float, int, int]] = []
+        self._now: list[int] = []
+        self._event_ids = itertools.count()
+        self.events = 0
+        self.steps = 0
+
+        self.protocol = Protocol()
+        self.profiler: Optional[Profiler] = None
+
+        self.common_random_numbers = False
+        self.seed(None)
+
+    def seed(self, seed: Optional[int]) -> None:
+        """
+        Make the model draw all random values from its own generator seeded with seed
+
+        Delay functions that are Distribution objects are bound to the model's
+        generator, other callables keep their own source of randomness. With
+        common_random_numbers set every Distribution gets its own generator seeded
+        from seed and the name of its transition instead, so models of different
+        configurations seeded equally draw the same delays of equally named transitions.
+
+        Parameters
+        ----------
+        seed : Optional[int]
+            seed of the generator, taken from system entropy when None
+        """
+        self.rng = random.Random(seed)
+        self.net.rng = self.rng
+        base = seed if seed is not None else self.rng.getrandbits(128)
+        for i, t in enumerate(self.ts):
+            if isinstance(t.get_delay, Distribution):
+                if self.common_random_numbers:
+                    rng = random.Random(RandomFunctions.derive_seed(base, t.name))
+                else:
+                    rng = self.rng
+                self.net.delay[i] = t.get_delay.bind(rng)
+
     def simulate(self,
                  sim_time: Numeric,
-                 warmup_time: Numeric = 0,
-                 is_protocol: bool = True,
-                 is_result: bool = True) -> dict[str, float]:
+                 warmup_time: Numeric | str = 0,
+                 is_protocol: bool = False,
+                 is_result: bool = True,
+                 seed: Optional[int] = None) -> dict[str, float]:
         """
         Perform Petri net simulation with given warmup and simulation time
 
         Parameters
         ----------
         sim_time : Numeric
-            time of simulation after warmup if specified
-        warmup_time: Numeric
-            time of warmup, no warmup is performed when 0
+            time of simulation after warmup if specified, counted from the current time
+        warmup_time: Numeric | str
+            time of warmup, no warmup is performed when 0, detected with
+            detect_warmup over intervals of sim_time / 100 when 'auto'; counters
+            are cleared after warmup, so results calculated from them, e.g. the lose
+            probability of StandardModel, count only tokens of the simulation time
         is_protocol: bool
-            whether to output protocol
+            whether to write protocol into the model's protocol, printed by default
         is_result: bool
             whether to output simulation results
+        seed: Optional[int]
+            seed of the model's generator, the current generator is kept when None
 
         Returns
         -------
@@ -37,25 +131,295 @@ class Model:
             of output variables and values the output variables values
         """
 
-        if warmup_time:
+        if seed is not None:
+            self.seed(seed)
+
+        start = self.curr_t
+        if warmup_time == 'auto':
+            warmup_time = self.detect_warmup(sim_time / 100, sim_time)
+        elif warmup_time:
             self._warmup(warmup_time)
 
-        self._simulate_part(sim_time + warmup_time, warmup_time, is_protocol)
+        self._simulate_part(start + warmup_time + sim_time, is_protocol)
 
         result = self._calc_stats()
 
-        if is_result: self._print_stats(result)
+        if is_result:
+            if self.detected_warmup_time is not None: print("Detected warmup time =", self.detected_warmup_time)
+            self._print_stats(result)
 
         return result
 
 
+    def simulate_until_precision(self,
+                                 precision: float = 0.05,
+                                 absolute_precision: float = 1e-3,
+                                 level: float = 0.95,
+                                 batch_time: Numeric = 500,
+                                 warmup_time: Numeric = 0,
+                                 outputs: Optional[list[str]] = None,
+                                 min_batches: int = 10,
+                                 max_batches: int = 40,
+                                 max_time: Numeric = 1_000_000,
+                                 is_result: bool = True,
+                                 seed: Optional[int] = None) -> dict[str, Any]:
+        """
+        Perform Petri net simulation until confidence intervals of outputs are narrow enough
+
+        The run after warmup is split into batches, every batch gives the output variables
+        calculated over it alone. The simulation stops as soon as the batch means confidence
+        interval of every requested output has half-width not greater than precision times
+        its mean or than absolute_precision, so outputs with means near zero do not keep it
+        running, or when max_time is reached, with a warning. When max_batches are gathered
+        adjacent batches are merged and batches become twice as long, which keeps the batch
+        means close to independent.
+
+        Parameters
+        ----------
+        precision : float
+            required half-width of confidence intervals relative to the means
+        absolute_precision : float
+            half-width of confidence intervals accepted whatever the means
+        level : float
+            confidence level of the intervals
+        batch_time : Numeric
+            initial time of a batch
+        warmup_time : Numeric
+            time of warmup, no warmup is performed when 0
+        outputs : Optional[list[str]]
+            names of output variables to wait for, every output variable when None
+        min_batches : int
+            number of batches gathered before the first check
+        max_batches : int
+            number of batches at which adjacent batches are merged
+        max_time : Numeric
+            time after warmup at which the simulation stops anyway
+        is_result : bool
+            whether to output simulation results
+        seed : Optional[int]
+            seed of the model's generator, the current generator is kept when None
+
+        Returns
+        -------
+        dict[str, Any]
+            "result" - means of output variables over batches,
+            "half-width" - half-widths of their confidence intervals,
+            "converged" - whether the precision was reached before max_time,
+            "batches", "events" and "time" - number of batches, events and time simulated after warmup
+        """
+        if seed is not None:
+            self.seed(seed)
+
+        if warmup_time:
+            self._warmup(warmup_time)
+
+        start_t, start_events = self.curr_t, self.events
+        max_batches -= max_batches % 2
+        batches: list[dict[str, float]] = []
+
+        while True:
+            self.stats.reset(self.curr_t)
+            self._reset_counters()
+            self._simulate_part(self.curr_t + batch_time)
+            stats = self._calc_stats()
+            batches.append({k: stats[k] for k in (outputs if outputs is not None else stats)})
+
+            if len(batches) >= max_batches:
+                batches = [{k: (a[k] + b[k]) / 2 for k in a} for a, b in zip(batches[::2], batches[1::2])]
+                batch_time *= 2
+
+            intervals = {k: batch_means_interval([b[k] for b in batches], level) for k in batches[0]}
+            converged = len(batches) >= min_batches and all(
+                half_width <= max(precision * abs(mean), absolute_precision) for mean, half_width in intervals.values()
+            )
+            if converged:
+                break
+            if self.curr_t - start_t >= max_time:
+                warnings.warn(f"precision not reached in {max_time} time units", RuntimeWarning)
+                break
+
+        result = {k: mean for k, (mean, _) in intervals.items()}
+
+        if is_result: self._print_stats(result)
+
+        return {
+            "result": result,
+            "half-width": {k: half_width for k, (_, half_width) in intervals.items()},
+            "converged": converged,
+            "batches": len(batches),
+            "events": self.events - start_events,
+            "time": self.curr_t - start_t,
+        }
+
+    def replicate(self,
+                  n: int,
+                  sim_time: Numeric,
+                  warmup_time: Numeric = 0,
+                  seed: Optional[int] = None,
+                  state: Optional[bytes] = None,
+                  lockstep: bool = False) -> list[dict[str, float]]:
+        """
+        Perform n independent simulations reusing the compiled net, resetting the model before each one
+
+        With lockstep all replications are advanced at once by lockstep.Lockstep,
+        which needs NumPy, holds their markings as rows of arrays and draws their
+        delays in batches, so many replications cost little more than one. Only
+        means of tracked elements and markings are available to _calc_stats then.
+
+        Parameters
+        ----------
+        n : int
+            number of replications
+        sim_time : Numeric
+            time of simulation after warmup if specified
+        warmup_time: Numeric
+            time of warmup, no warmup is performed when 0
+        seed: Optional[int]
+            seed whose sub-streams are used by replications, drawn from the model's generator when None
+        state: Optional[bytes]
+            state returned by save_state every replication starts from instead of the initial state,
+            e.g. the state after a warmup shared by the replications, not supported with lockstep
+        lockstep: bool
+            whether to advance the replications at once from the initial state
+
+        Returns
+        -------
+        list[dict[str, float]]
+            simulation results of every replication in the form returned by simulate
+        """
+        if seed is None:
+            seed = self.rng.getrandbits(64)
+
+        if lockstep:
+            if state is not None:
+                raise ValueError("lockstep replications start from the initial state")
+            means, markings = Lockstep(self.net, n, self.counters, seed).run(sim_time, warmup_time)
+            return [self._calc_stats_of(m, marking) for m, marking in zip(means.tolist(), markings.tolist())]
+
+        results = []
+        for replication_seed in RandomFunctions.spawn(seed, n):
+            if state is None:
+                self.reset()
+                self.seed(replication_seed)
+            else:
+                self.load_state(state, replication_seed)
+            results.append(self.simulate(sim_time, warmup_time, False, False))
+        return results
+
+    def save_state(self) -> bytes:
+        """
+        Get the full state of the model as a compressed binary blob
+
+        The blob holds the marking, loads of transitions, the event calendar, the
+        current time, statistics and the state of the model's generator and of the
+        buffers of delay distributions, so loading it continues the simulation exactly.
+
+        Returns
+        -------
+        bytes
+            state to be passed to load_state of a model of the same net
+        """
+        next_id = next(self._event_ids)
+        self._event_ids = itertools.count(next_id)
+        state = {
+            "places": [p.name for p in self.net.places],
+            "transitions": [t.name for t in self.ts],
+            "marking": list(self.net.marking),
+            "loads": list(self.net.loads),
+            "reserved": list(self.net.reserved),
+            "events": list(self._events),
+            "next_id": next_id,
+            "now": list(self._now),
+            "events_count": self.events,
+            "steps": self.steps,
+            "curr_t": self.curr_t,
+            "next_t": self.next_t,
+            "detected_warmup_time": self.detected_warmup_time,
+            "stats": self.stats.state(),
+            "rng": self.rng.getstate(),
+            "common_random_numbers": self.common_random_numbers,
+            "delays": [d.state() if isinstance(d, Distribution) else None for d in self.net.delay],
+            "delay_rngs": [
+                d.rng.getstate() if isinstance(d, Distribution) and d.rng not in (None, self.rng) else None
+                for d in self.net.delay
+            ],
+        }
+        return zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+
+    def load_state(self, state: bytes, seed: Optional[int] = None) -> None:
+        """
+        Restore the state returned by save_state
+
+        Parameters
+        ----------
+        state : bytes
+            state saved by a model of the same net
+        seed : Optional[int]
+            seed of the model's generator after restoring, the saved generator is restored when None,
+            so distinct seeds make simulations continuing from one state independent
+        """
+        state = pickle.loads(zlib.decompress(state))
+        if state["places"] != [p.name for p in self.net.places] or state["transitions"] != [t.name for t in self.ts]:
+            raise ValueError("state of a different net")
+
+        self.net.marking[:] = state["marking"]
+        self.net.loads[:] = state["loads"]
+        self.net.reserved[:] = state["reserved"]
+        self._events[:] = state["events"]
+        self._event_ids = itertools.count(state["next_id"])
+        self._now[:] = state["now"]
+        self.events = state["events_count"]
+        self.steps = state["steps"]
+        self.curr_t, self.next_t = state["curr_t"], state["next_t"]
+        self.detected_warmup_time = state["detected_warmup_time"]
+        self.stats.restore(state["stats"])
+        self.common_random_numbers = state["common_random_numbers"]
+        self._refresh_enabled()
+
+        if seed is not None:
+            self.seed(seed)
+            return
+        self.rng.setstate(state["rng"])
+        for d, delay_state, rng_state in zip(self.net.delay, state["delays"], state["delay_rngs"]):
+            if isinstance(d, Distribution) and d.rng is not None:
+                d.rng = self.rng
+                if rng_state is not None:
+                    d.rng = random.Random()
+                    d.rng.setstate(rng_state)
+                d.restore(delay_state)
+
+    def save(self, filename: str) -> None:
+        """Save the state of the model into a file replacing it atomically, e.g. to checkpoint a long run"""
+        with open(filename + '.tmp', 'wb') as file:
+            file.write(self.save_state())
+        os.replace(filename + '.tmp', filename)
+
+    def load(self, filename: str, seed: Optional[int] = None) -> None:
+        """Restore the state of the model saved into a file by save"""
+        with open(filename, 'rb') as file:
+            self.load_state(file.read(), seed)
+
+    def reset(self) -> None:
+        """Return the model to its initial state clearing statistical data"""
+        self.net.reset()
+        self._events.clear()
+        self._now.clear()
+        self.events = 0
+        self.steps = 0
+        self.curr_t, self.next_t = 0., 0.
+        self.detected_warmup_time = None
+        self.stats.reset(0.)
+        self._refresh_enabled()
+
     def simulate_intervals(self,
                            sim_time: Numeric,
                            interval: Numeric,
-                           warmup_time: Numeric = 0,
-                           name: Optional[str] = None) -> None:
+                           warmup_time: Numeric | str = 0,
+                           name: Optional[str] = None,
+                           seed: Optional[int] = None,
+                           sink: type[ResultSink] = CSVWriter) -> None:
         """
-        Perform Petri net simulation saving the statistical data after each interval time pass into csv
+        Perform Petri net simulation saving the statistical data after each interval time pass into a file
 
         Parameters
         __________
@@ -63,35 +427,242 @@ class Model:
             time of experiment after warmup if specified
         interval : Numeric
             time of the intervals between statistical data calculations
-        warmup_time: Numeric
-            warmup time to adjust statistical information gathering
+        warmup_time: Numeric | str
+            time of warmup, detected with detect_warmup over intervals of sim_time / 100 when 'auto'
+        name: Optional[str]
+            name of the file without -result suffix, name of the model's class when None
+        seed: Optional[int]
+            seed of the model's generator, the current generator is kept when None
+        sink: type[ResultSink]
+            class of the sink writing the file, e.g. CSVWriter or NPYWriter
         """
 
-        filename = f"{name if name else self.__class__.__name__}-result.csv"
-        CSVSaver.create_clear_file(filename)
+        filename = f"{name if name else self.__class__.__name__}-result.{sink.extension}"
+
+        with sink(filename) as writer:
+            for current, stats in self.simulate_iter(sim_time, interval, warmup_time=warmup_time, seed=seed):
+                if warmup_time == 'auto' and not writer.has_header:
+                    print("Detected warmup time =", self.detected_warmup_time)
+                print(current)
+                if not writer.has_header:
+                    writer.write_header(["Time"] + list(stats))
+                writer.write([current] + list(stats.values()))
+                self._print_stats(stats)
+
+    def simulate_iter(self,
+                      sim_time: Numeric,
+                      interval: Optional[Numeric] = None,
+                      events: Optional[int] = None,
+                      warmup_time: Numeric | str = 0,
+                      seed: Optional[int] = None) -> Iterator[tuple[float, dict[str, float]]]:
+        """
+        Perform Petri net simulation yielding the statistical data after each interval time or number of events
 
-        if warmup_time:
+        Nothing is kept between snapshots, so the consumer may aggregate them, show them
+        as they come or stop early, the model stays in the state of the last snapshot.
+        Warmup is performed when the first snapshot is requested.
+
+        Parameters
+        ----------
+        sim_time : Numeric
+            time of simulation after warmup if specified
+        interval : Optional[Numeric]
+            time between snapshots
+        events : Optional[int]
+            number of events between snapshots, the last snapshot is taken at sim_time
+        warmup_time : Numeric | str
+            time of warmup, detected with detect_warmup over intervals of sim_time / 100 when 'auto'
+        seed : Optional[int]
+            seed of the model's generator, the current generator is kept when None
+
+        Yields
+        ------
+        tuple[float, dict[str, float]]
+            time of the snapshot counted from the end of warmup and the output variables of _calc_stats
+        """
+        if (interval is None) == (events is None):
+            raise ValueError("exactly one of interval and events must be given")
+
+        if seed is not None:
+            self.seed(seed)
+
+        start = self.curr_t
+        current = interval
+        if warmup_time == 'auto':
+            # detection stops halfway through at the latest to leave snapshots to take
+            warmup_time = self.detect_warmup(sim_time / 100, sim_time / 2)
+            if interval is not None:
+                current = interval * ((self.curr_t - start - warmup_time) // interval + 1)
+        elif warmup_time:
             self._warmup(warmup_time)
+        origin, end = start + warmup_time, start + warmup_time + sim_time
 
-        current = warmup_time + interval
+        if interval is not None:
+            while current <= sim_time:
+                self._simulate_part(origin + current, False, True)
+                yield current, self._calc_stats()
+                current += interval
+        else:
+            while self.curr_t < end:
+                self._simulate_part(end, False, True, self.events + events)
+                yield min(self.curr_t, end) - origin, self._calc_stats()
 
-        while current <= sim_time + warmup_time:
-            print(current - warmup_time)
-            self._simulate_part(current, warmup_time, False, True)
-            stats = self._calc_stats()
-            CSVSaver.save(filename, [current - warmup_time] + list(stats.values()))
-            self._print_stats(self._calc_stats())
-            current += interval
+    def detect_warmup(self, interval: Numeric, max_time: Numeric, batch_size: int = 5) -> float:
+        """
+        Simulate until the end of the initialization bias is detected with MSER and discard statistics before it
+
+        Means of tracked elements are taken over consecutive intervals and MSER is
+        applied to every series, the truncation point is the latest of them. Detection
+        stops once every truncation point lies in the first half of its series or
+        after max_time. Statistics and counters keep only the part after the
+        truncation point, the simulation itself continues from the current state.
+
+        Parameters
+        ----------
+        interval : Numeric
+            time of the intervals the series consist of
+        max_time : Numeric
+            maximum time of detection
+        batch_size : int
+            number of intervals averaged by MSER, 5 for MSER-5
+
+        Returns
+        -------
+        float
+            detected warmup time counted from the start of detection, also kept in detected_warmup_time
+        """
+        start = self.curr_t
+        self.stats.reset(start)
+        times = [start]
+        snapshots = [(self.stats.snapshot(start), [p.n for p in self.counters])]
+        series: list[list[float]] = [[] for _ in self.stats.values]
+
+        while True:
+            self._simulate_part(times[-1] + interval)
+            now = self.curr_t
+            snapshot = self.stats.snapshot(now)
+            previous = snapshots[-1][0][0]
+            for slot, values in enumerate(series):
+                values.append((snapshot[0][slot] - previous[slot]) / (now - times[-1]))
+            times.append(now)
+            snapshots.append((snapshot, [p.n for p in self.counters]))
+
+            truncations = [mser(values, batch_size) for values in series]
+            if all(valid for _, valid in truncations) or now - start >= max_time:
+                break
+
+        d = max(truncation for truncation, _ in truncations)
+        self.stats.truncate(times[d], snapshots[d][0], self.curr_t)
+        for p, n in zip(self.counters, snapshots[d][1]):
+            p.n -= n
+
+        self.detected_warmup_time = times[d] - start
+        return self.detected_warmup_time
+
+    def solve(self,
+              sim_time: Optional[Numeric] = None,
+              warmup_time: Numeric | str = 0,
+              max_states: int = 100_000,
+              is_result: bool = True,
+              seed: Optional[int] = None) -> dict[str, float]:
+        """
+        Get the steady-state results exactly from the Markov chain of the net, simulating when it has none
+
+        When every delay is an Exponential or Constant(0) distribution the net is a
+        generalized stochastic Petri net, its reachability graph is built and the
+        steady state of the chain is solved, see ctmc.CTMC. Results are calculated
+        by _calc_stats from the steady-state means, places without consumers, like
+        counters of served clients, hold their throughputs, so ratios of counters
+        are long-run ratios. Otherwise, or when the net has dead markings or more
+        than max_states tangible states, the model is simulated.
+
+        Parameters
+        ----------
+        sim_time : Optional[Numeric]
+            time of simulation in case the net can not be solved, NotMarkovian is raised then when None
+        warmup_time : Numeric | str
+            time of warmup of the simulation
+        max_states : int
+            maximum number of tangible states
+        is_result : bool
+            whether to output results
+        seed : Optional[int]
+            seed of the simulation
+
+        Returns
+        -------
+        dict[str, float]
+            results with the keys of simulate
+        """
+        try:
+            solution = CTMC(self.net, max_states).solve()
+        except NotMarkovian:
+            if sim_time is None:
+                raise
+            return self.simulate(sim_time, warmup_time, is_result=is_result, seed=seed)
+
+        index = {e: i for i, e in enumerate(self.net.places + self.net.transitions)}
+        means = solution.marking + solution.loads
+        values = [0.] * len(self.net.slots)
+        for e, slot in self.net.slots.items():
+            values[slot] = means[index[e]]
+
+        marking = list(self.net.marking)
+        for p, throughput in solution.throughputs.items():
+            marking[p] = throughput
+        result = self._calc_stats_of(values, marking)
+
+        if is_result:
+            print("Tangible states =", solution.states)
+            self._print_stats(result)
+        return result
+
+    def collapse_immediate(self) -> list[Transition]:
+        """
+        Fuse free-choice immediate transitions into the transitions feeding them, see CompiledNet.collapse_immediate
+
+        Collapsed transitions are never scheduled, their choices are made at the output
+        of the feeding transitions, so the statistics keep their distribution while fewer
+        events are simulated. Tracked elements and counters are kept. Statistics are
+        cleared, so collapsing is to be done before simulation.
+
+        Returns
+        -------
+        list[Transition]
+            collapsed transitions
+        """
+        collapsed = self.net.collapse_immediate(set(self.net.slots) | set(self.counters))
+        self.stats = self.net.track(list(self.net.slots))
+        self._refresh_enabled()
+        return [self.ts[i] for i in collapsed]
+
+    def profile(self) -> Profiler:
+        """Attach a new profiler gathering counters of the following simulations, set profiler to None to detach it"""
+        self.profiler = Profiler(self.ts)
+        return self.profiler
+
+    def _reset_counters(self) -> None:
+        """Clear counters the output variables are calculated from"""
+        for p in self.counters:
+            p.n = 0
 
     def _warmup(self, warmup_time: Numeric) -> None:
-        """Perform warmup before gathering stats of the model"""
-        self._simulate_part(warmup_time, is_protocol=False, is_stats=False)
+        """
+        Perform warmup before gathering stats of the model and clear counters
+
+        Counted tokens no longer include the warmup, e.g. the lose probability of
+        StandardModel with warmup drops by an order of magnitude to about 0.0002,
+        as nearly all losses happen before the indoors cashiers start working.
+        """
+        self._simulate_part(self.curr_t + warmup_time, is_protocol=False, is_stats=False)
+        self.stats.reset(self.curr_t)
+        self._reset_counters()
 
     def _simulate_part(self,
                        max_time: Numeric,
-                       warmup_adjustment: Numeric = 0,
-                       is_protocol: bool = True,
-                       is_stats: bool = True) -> None:
+                       is_protocol: bool = False,
+                       is_stats: bool = True,
+                       max_events: Optional[int] = None) -> None:
         """
         Change the state of the model by performing simulation from current state up to max_time
 
@@ -99,82 +670,254 @@ class Model:
         ----------
         max_time: Numeric
             time to which change the state of the model
-        warmup_adjustment: Numeric
-            warmup time to adjust statistical information gathering
         is_protocol: bool
-            whether to output protocol
+            whether to write protocol into the model's protocol
         is_result: bool
             whether to gather statistical information
+        max_events: Optional[int]
+            number of events output since the start of the model at which to stop before max_time,
+            the protocol and the profiler are not used then
         """
-        while self.curr_t < max_time:
-            self._input(is_protocol)
-            self.next_t = self._find_next_t(is_protocol)
-            if is_stats: self._update_stats(warmup_adjustment)
+        self._refresh_enabled()
+
+        if max_events is not None:
+            self._simulate_part_events(max_time, max_events, is_stats)
+        elif is_protocol:
+            self._simulate_part_protocol(max_time, is_stats)
+        elif self.profiler is not None:
+            self._simulate_part_profiled(max_time, is_stats)
+        elif is_stats:
+            stats = self.stats
+            while self.curr_t < max_time:
+                self._input()
+                self.next_t = self._find_next_t()
+                if stats.batch_end <= self.next_t < INF: stats.advance(self.next_t)
+                self.curr_t = self.next_t
+                self._output()
+        else:
+            while self.curr_t < max_time:
+                self._input()
+                self.curr_t = self.next_t = self._find_next_t()
+                self._output()
+
+    def _simulate_part_events(self, max_time: Numeric, max_events: int, is_stats: bool) -> None:
+        """Perform _simulate_part stopping once max_events events are output"""
+        stats = self.stats
+        while self.curr_t < max_time and self.events < max_events:
+            self._input()
+            self.next_t = self._find_next_t()
+            if is_stats and stats.batch_end <= self.next_t < INF: stats.advance(self.next_t)
             self.curr_t = self.next_t
-            self._output(is_protocol)
+            self._output()
 
-    def _input(self, is_protocol: bool = False) -> None:
+    def _simulate_part_protocol(self, max_time: Numeric, is_stats: bool) -> None:
+        """Perform _simulate_part writing every step into the protocol"""
+        protocol = self.protocol
+        while self.curr_t < max_time:
+            self._input_protocol(protocol)
+            self.next_t = self._find_next_t()
+            protocol.next_event(self.curr_t, self.next_t, self._next_transition())
+            if is_stats and self.stats.batch_end <= self.next_t < INF: self.stats.advance(self.next_t)
+            self.curr_t = self.next_t
+            self._output()
+            protocol.state(self.curr_t, "Output result", *self._state())
+
+    def _simulate_part_profiled(self, max_time: Numeric, is_stats: bool) -> None:
+        """Perform _simulate_part accounting time of every phase in the model's profiler"""
+        profiler = self.profiler
+        phases = profiler.phases
+        clock = time.perf_counter_ns
+        stats = self.stats
+        start, events = clock(), self.events
+        while self.curr_t < max_time:
+            t0 = clock()
+            self._input_profiled(profiler)
+            t1 = clock()
+            self.next_t = self._find_next_t()
+            t2 = clock()
+            if is_stats and stats.batch_end <= self.next_t < INF: stats.advance(self.next_t)
+            t3 = clock()
+            self.curr_t = self.next_t
+            self._output()
+            t4 = clock()
+            phases['input'] += t1 - t0
+            phases['find_next_t'] += t2 - t1
+            phases['stats'] += t3 - t2
+            phases['output'] += t4 - t3
+            profiler.steps += 1
+        profiler.wall += clock() - start
+        profiler.events += self.events - events
+
+    def _input(self) -> None:
         """Perform repetative input of model's transitions solving conflicts until no transition is enabled"""
-        enabled = [t for t in self.ts if t.enabled]
-
-        if is_protocol: self._print_enabled(enabled)
+        net = self.net
+        enabled = self._enabled_transitions()
 
         while enabled:
-            maximum = max(f.priority for f in enabled)
-            enabled = [f for f in enabled if f.priority == maximum]
-            t = random.choices(enabled, weights=[f.probability for f in enabled])[0]
-            if is_protocol: print("Chose", t)
-            t.input(self.curr_t)
-            enabled = [t for t in self.ts if t.enabled]
-
-        if is_protocol: self._print_state("\nInput result")
-
-    def _find_next_t(self, is_protocol) -> float:
-        """Find the nearest otuput time among model's transitions"""
-        next_el = min(self.ts, key=lambda e: e.next_t)
-        next_t = next_el.next_t
-
-        if is_protocol: print(f"It's time for event in {next_el}, time = {next_t}")
+            maximum = max(net.priority[i] for i in enabled)
+            enabled = [i for i in enabled if net.priority[i] == maximum]
+            if len(enabled) > 1:
+                i = self.rng.choices(enabled, weights=[net.probability[i] for i in enabled])[0]
+            else:
+                i = enabled[0]
+            self._schedule(i)
+            self._update_enabled(net.input_changes[i])
+            enabled = self._enabled_transitions()
+
+    def _schedule(self, i: int) -> None:
+        """Input transition i once scheduling its output, into the list of current events when it has no delay"""
+        next_t = self.net.input(i, self.curr_t)
+        if next_t == self.curr_t:
+            self._now.append(i)
+        else:
+            heapq.heappush(self._events, (next_t, next(self._event_ids), i))
 
-        return next_t
+    def _input_profiled(self, profiler: Profiler) -> None:
+        """Perform _input counting firings of transitions and rounds of conflict resolution"""
+        net = self.net
+        enabled = self._enabled_transitions()
 
-    def _update_stats(self, warmup_adjustment: Numeric) -> None:
-        """Update statistical information of the model's elements"""
-        for e in self.ts + self.ps:
-            e.update_stats(self.curr_t - warmup_adjustment, self.next_t - warmup_adjustment)
+        while enabled:
+            profiler.rounds += 1
+            maximum = max(net.priority[i] for i in enabled)
+            enabled = [i for i in enabled if net.priority[i] == maximum]
+            if len(enabled) > 1:
+                profiler.conflicts += 1
+                i = self.rng.choices(enabled, weights=[net.probability[i] for i in enabled])[0]
+            else:
+                i = enabled[0]
+            profiler.firings[i] += 1
+            self._schedule(i)
+            self._update_enabled(net.input_changes[i])
+            enabled = self._enabled_transitions()
+
+    def _input_protocol(self, protocol: Protocol) -> None:
+        """Perform _input writing conflicts and chosen transitions into the protocol"""
+        net = self.net
+        enabled = self._enabled_transitions()
+
+        protocol.enabled(self.curr_t, [self.ts[i] for i in enabled])
 
-    def _output(self, is_protocol: bool = False) -> None:
-        """Perform repetative output of model's transitions"""
-        for t in self.ts:
-            if t.next_t == self.curr_t:
-                t.output(self.curr_t)
+        while enabled:
+            maximum = max(net.priority[i] for i in enabled)
+            enabled = [i for i in enabled if net.priority[i] == maximum]
+            if len(enabled) > 1:
+                i = self.rng.choices(enabled, weights=[net.probability[i] for i in enabled])[0]
+            else:
+                i = enabled[0]
+            protocol.chose(self.curr_t, self.ts[i])
+            self._schedule(i)
+            self._update_enabled(net.input_changes[i])
+            enabled = self._enabled_transitions()
+
+        protocol.state(self.curr_t, "Input result", *self._state())
+
+    def _next_transition(self) -> Optional[Transition]:
+        """Get the transition of the next event"""
+        if self._now:
+            return self.ts[self._now[0]]
+        return self.ts[self._events[0][2]] if self._events else None
+
+    def _refresh_enabled(self) -> None:
+        """Recheck every transition, needed after the marking was changed outside of the model"""
+        self._enabled = {i for i in range(len(self.ts)) if self.net.enabled(i)}
+
+    def _update_enabled(self, arcs: Iterable[tuple[int, int]]) -> None:
+        """Recheck only the transitions whose enabling depends on the places of the changed arcs"""
+        net = self.net
+        for p, _ in arcs:
+            for i in net.dependents[p]:
+                if net.enabled(i):
+                    self._enabled.add(i)
+                else:
+                    self._enabled.discard(i)
+
+    def _enabled_transitions(self) -> list[int]:
+        """Get indices of enabled transitions in the order of model's transitions"""
+        return sorted(self._enabled)
+
+    def _find_next_t(self) -> float:
+        """Find the nearest otuput time in the model's event calendar"""
+        if self._now:
+            return self.curr_t
+        return self._events[0][0] if self._events else INF
+
+    def _output(self) -> None:
+        """
+        Perform output of every event scheduled for the current time as one step
 
-        if is_protocol: self._print_state("\nOutput result")
+        Events in the calendar come first, since they were scheduled before the
+        events without delay input at the current time, so the order of outputs
+        is the order of scheduling.
+        """
+        net, events, curr_t = self.net, self._events, self.curr_t
+        n = 0
+        while events and events[0][0] == curr_t:
+            i = heapq.heappop(events)[2]
+            net.output(i, curr_t)
+            self._update_enabled(net.output_changes[i])
+            n += 1
+        if self._now:
+            now, self._now = self._now, []
+            for i in now:
+                net.output(i, curr_t)
+                self._update_enabled(net.output_changes[i])
+            n += len(now)
+        if n:
+            self.events += n
+            self.steps += 1
+
+    @property
+    def coalesced(self) -> int:
+        """Number of events output in the same step as an earlier event"""
+        return self.events - self.steps
+
+    def mean(self, element: Element) -> float:
+        """Get the time-weighted mean marking of a tracked place or mean load of a tracked transition"""
+        return self.stats.mean(self.net.slots[element], self.curr_t)
+
+    def variance(self, element: Element) -> float:
+        """Get the time-weighted variance of marking of a tracked place or load of a tracked transition"""
+        return self.stats.variance(self.net.slots[element], self.curr_t)
+
+    def confidence_interval(self, element: Element, level: float = 0.95) -> tuple[float, float]:
+        """Get the batch means estimate of the mean of a tracked element and the half-width of its confidence interval"""
+        return self.stats.confidence_interval(self.net.slots[element], level)
 
     def _calc_stats(self) -> dict[str, float]:
         """Calculate current statistical data of elements"""
+        if self.results is not None:
+            return {name: result(self) for name, result in self.results.items()}
         stats = {}
+        slots = self.net.slots
         for t in self.ts:
-            stats[f"Transition {t.name} mean load"] = t.mean
+            if t in slots:
+                stats[f"Transition {t.name} mean load"] = self.mean(t)
         for p in self.ps:
-            stats[f"Place {p.name} mean marking"] = p.mean
+            if p in slots:
+                stats[f"Place {p.name} mean marking"] = self.mean(p)
             stats[f"Place {p.name} current marking"] = p.n
         return stats
 
-    def _print_state(self, heading: Optional[str] = None) -> None:
-        """Print current state of the model"""
-        if heading: print(heading)
-        print("\n".join(f"{p} n = {p.n}" for p in self.ps))
-        print("\n".join(f"{t} next_ts = {t.next_ts}" for t in self.ts))
-        print()
-
-    def _print_enabled(self, enabled: list[Transition]) -> None:
-        """Print current state of enabled transitions"""
-        if enabled:
-            print("Enabled transitions:")
-            print("\n".join(f"{t} {t.priority} {t.probability}" for t in enabled))
-        else:
-            print("No enabled transitions")
+    def _calc_stats_of(self, means: list[float], marking: list[float]) -> dict[str, float]:
+        """Calculate the output variables of given means of tracked elements by slots and a given marking"""
+        stats, current = self.stats, list(self.net.marking)
+        self.stats = MeanValues(means)
+        self.net.marking[:] = marking
+        try:
+            return self._calc_stats()
+        finally:
+            self.stats = stats
+            self.net.marking[:] = current
+
+    def _state(self) -> tuple[dict[str, int], dict[str, list[float]]]:
+        """Get markings of places and pending times of output of transitions by names"""
+        next_ts: dict[str, list[float]] = {t.name: [] for t in self.ts}
+        for next_t, _, i in sorted(self._events):
+            next_ts[self.ts[i].name].append(next_t)
+        for i in self._now:
+            next_ts[self.ts[i].name].append(self.curr_t)
+        return {p.name: p.n for p in self.ps}, next_ts
 
     def _print_stats(self, result: dict[str, float]) -> None:
         """Print the statistical data of eleents"""
@@ -0,0 +1,326 @@
+from typing import Any, NamedTuple, Optional
+from elements import Element, Place, Transition
+from compiled_net import CompiledNet
+from model import Model
+from random_functions import Constant, Distribution, Exponential, Normal, Triangular, Uniform
+import json
+import os
+import tomllib
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+DISTRIBUTIONS: dict[str, type[Distribution]] = {
+    cls.__name__: cls for cls in (Constant, Exponential, Uniform, Normal, Triangular)
+}
+
+
+class PlaceSpec(NamedTuple):
+    name: str
+    marking: int
+    capacity: Optional[int]
+
+
+class TransitionSpec(NamedTuple):
+    name: str
+    delay: Distribution
+    priority: int
+    probability: float
+    inputs: tuple[tuple[int, int], ...]
+    outputs: tuple[tuple[int, int], ...]
+    inhibitors: tuple[tuple[int, int], ...]
+
+
+class Mean(NamedTuple):
+    """Result of the mean of a tracked place or transition of a model divided by per"""
+    kind: str
+    index: int
+    per: float = 1.
+
+    def __call__(self, model: Model) -> float:
+        return model.mean((model.ps if self.kind == 'place' else model.ts)[self.index]) / self.per
+
+
+class Share(NamedTuple):
+    """Result of the share of tokens of places of a model among tokens of other places, e.g. of lost clients"""
+    places: tuple[int, ...]
+    of: tuple[int, ...]
+
+    def __call__(self, model: Model) -> float:
+        return sum(model.ps[p].n for p in self.places) / sum(model.ps[p].n for p in self.of)
+
+
+class NetTemplate:
+    """
+    Validated definition of a Petri net instantiating models of it
+
+    A definition is a dict, e.g. loaded from a json, toml or yaml file:
+
+        places: {name: initial marking} or [{name, marking, capacity}]
+        transitions: [{name, delay, priority, probability, in: {place: k}, out: {place: k}, inhibit: {place: k}}]
+        tracked: [names of places and transitions whose means are reported], every element by default
+        counters: [names of places cleared after warmup]
+        results: {name: {mean: element, per: k} or {share: [places], of: [places]}}, reported
+                 instead of means of tracked elements and markings of places when given
+
+    A delay is a number of a constant delay, a list of a distribution name followed by its
+    parameters, e.g. ["Exponential", 0.75], {distribution, params} or a Distribution; priority,
+    probability, delay and arcs are optional. The net is compiled once, instantiate then only
+    creates elements and vectors of the initial marking sharing the compiled structure.
+    """
+    def __init__(self, definition: dict[str, Any]) -> None:
+        places = definition.get("places", {})
+        if isinstance(places, dict):
+            places = [{"name": name, "marking": n} for name, n in places.items()]
+        self.places: tuple[PlaceSpec, ...] = tuple(
+            PlaceSpec(
+                str(p["name"]),
+                _count(p.get("marking", 0), f"marking of place {p['name']}", 0),
+                _count(p["capacity"], f"capacity of place {p['name']}", 1) if p.get("capacity") is not None else None
+            )
+            for p in places
+        )
+        index = {p.name: i for i, p in enumerate(self.places)}
+        if len(index) != len(self.places):
+            raise ValueError("duplicate place names")
+
+        transitions = []
+        for t in definition.get("transitions", []):
+            name = str(t["name"])
+            transitions.append(TransitionSpec(
+                name,
+                _delay(t.get("delay", 0), name),
+                int(t.get("priority", 0)),
+                float(t.get("probability", 1.)),
+                _arcs(t.get("in", {}), index, name),
+                _arcs(t.get("out", {}), index, name),
+                _arcs(t.get("inhibit", {}), index, name),
+            ))
+        self.transitions: tuple[TransitionSpec, ...] = tuple(transitions)
+        if len({t.name for t in self.transitions}) != len(self.transitions):
+            raise ValueError("duplicate transition names")
+
+        names = {**{p.name: ('place', i) for i, p in enumerate(self.places)},
+                 **{t.name: ('transition', i) for i, t in enumerate(self.transitions)}}
+        tracked = definition.get("tracked")
+        for name in (tracked or []) + definition.get("counters", []):
+            if name not in names:
+                raise ValueError(f"unknown element {name}")
+        self.tracked: Optional[tuple[tuple[str, int], ...]] = (
+            tuple(names[name] for name in tracked) if tracked is not None else None
+        )
+        self.counters: tuple[int, ...] = tuple(index[name] for name in definition.get("counters", []))
+        if any(names[name][0] != 'place' for name in definition.get("counters", [])):
+            raise ValueError("counters must be places")
+        results = definition.get("results")
+        self.results: Optional[dict[str, Mean | Share]] = (
+            {str(name): _result(spec, names, str(name)) for name, spec in results.items()} if results is not None else None
+        )
+
+        places, transitions = self._elements()
+        self._net = CompiledNet(places, transitions)
+
+    @classmethod
+    def load(cls, filename: str) -> 'NetTemplate':
+        """Load the definition from a json, toml or yaml file by its extension"""
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.toml':
+            with open(filename, 'rb') as file:
+                return cls(tomllib.load(file))
+        with open(filename, encoding='utf-8') as file:
+            if extension in ('.yaml', '.yml'):
+                if yaml is None:
+                    raise ImportError("PyYAML is required to load yaml definitions")
+                return cls(yaml.safe_load(file))
+            return cls(json.load(file))
+
+    @classmethod
+    def from_model(cls, model: Model) -> 'NetTemplate':
+        """Get the template of the net of a model whose delays are Distribution objects"""
+        return cls(model_definition(model))
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get the definition of the template"""
+        element_names = ([p.name for p in self.places], [t.name for t in self.transitions])
+        definition: dict[str, Any] = {
+            "places": [
+                {"name": p.name, "marking": p.marking, **({"capacity": p.capacity} if p.capacity is not None else {})}
+                for p in self.places
+            ],
+            "transitions": [
+                {
+                    "name": t.name,
+                    "delay": _delay_spec(t.delay),
+                    "priority": t.priority,
+                    "probability": t.probability,
+                    "in": {self.places[p].name: k for p, k in t.inputs},
+                    "out": {self.places[p].name: k for p, k in t.outputs},
+                    "inhibit": {self.places[p].name: k for p, k in t.inhibitors},
+                }
+                for t in self.transitions
+            ],
+            "counters": [self.places[p].name for p in self.counters],
+        }
+        if self.tracked is not None:
+            definition["tracked"] = [element_names[kind == 'transition'][i] for kind, i in self.tracked]
+        if self.results is not None:
+            definition["results"] = {name: _result_spec(result, *element_names) for name, result in self.results.items()}
+        return definition
+
+    def save(self, filename: str) -> None:
+        """Save the definition into a json file"""
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False, indent=2)
+
+    def arguments(self) -> dict[str, Any]:
+        """Get the arguments of Model creating a model of the net in its initial marking"""
+        places, transitions = self._elements()
+        tracked = None
+        if self.tracked is not None:
+            tracked = [(places if kind == 'place' else transitions)[i] for kind, i in self.tracked]
+        return {
+            "places": places,
+            "transitions": transitions,
+            "tracked": tracked,
+            "counters": [places[i] for i in self.counters],
+            "net": self._net.clone(places, transitions),
+            "results": dict(self.results) if self.results is not None else None,
+        }
+
+    def instantiate(self, model_class: type[Model] = Model) -> Model:
+        """
+        Create a model of the net in its initial marking
+
+        Parameters
+        ----------
+        model_class : type[Model]
+            class of the model taking the arguments of Model, e.g. a subclass calculating its own stats
+
+        Returns
+        -------
+        Model
+            model of the net sharing the compiled structure of the template
+        """
+        return model_class(**self.arguments())
+
+    def __call__(self, model_class: type[Model] = Model) -> Model:
+        return self.instantiate(model_class)
+
+    def _elements(self) -> tuple[list[Place], list[Transition]]:
+        """Create places and transitions of the net"""
+        places = [Place(p.name, p.marking, p.capacity) for p in self.places]
+        transitions = []
+        for t in self.transitions:
+            transition = Transition(t.name, t.delay, t.priority, t.probability)
+            transition.inplaces = {places[p]: k for p, k in t.inputs}
+            transition.outplaces = {places[p]: k for p, k in t.outputs}
+            transition.inhibitors = {places[p]: k for p, k in t.inhibitors}
+            transitions.append(transition)
+        return places, transitions
+
+
+def model_definition(model: Model) -> dict[str, Any]:
+    """Get the definition of the net of a model whose delays are Distribution objects and results Mean or Share"""
+    net = model.net
+    for t in net.transitions:
+        if not isinstance(t.get_delay, Distribution):
+            raise ValueError(f"delay of transition {t.name} is not a Distribution")
+    for name, result in (model.results or {}).items():
+        if not isinstance(result, (Mean, Share)):
+            raise ValueError(f"result {name} is neither Mean nor Share")
+    tracked: list[Element] = sorted(net.slots, key=net.slots.get)
+    definition = {
+        "places": [
+            {"name": p.name, "marking": n, "capacity": p.capacity} for p, n in zip(net.places, net.initial_marking)
+        ],
+        "transitions": [
+            {
+                "name": t.name,
+                "delay": _delay_spec(t.get_delay),
+                "priority": t.priority,
+                "probability": t.probability,
+                "in": {p.name: k for p, k in t.inplaces.items()},
+                "out": {p.name: k for p, k in t.outplaces.items()},
+                "inhibit": {p.name: k for p, k in t.inhibitors.items()},
+            }
+            for t in net.transitions
+        ],
+        "tracked": [e.name for e in tracked],
+        "counters": [p.name for p in model.counters],
+    }
+    if model.results is not None:
+        names = [p.name for p in net.places], [t.name for t in net.transitions]
+        definition["results"] = {name: _result_spec(result, *names) for name, result in model.results.items()}
+    return definition
+
+
+def _count(value: Any, what: str, minimum: int) -> int:
+    """Check that value is an integer not less than minimum"""
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise ValueError(f"{what} must be an integer not less than {minimum}, got {value!r}")
+    return value
+
+
+def _delay(spec: Any, name: str) -> Distribution:
+    """Get the distribution of a delay given by a number, a list, a dict or a Distribution"""
+    if isinstance(spec, Distribution):
+        return spec
+    if isinstance(spec, (int, float)) and not isinstance(spec, bool):
+        return Constant(spec)
+    if isinstance(spec, dict):
+        distribution, params = spec.get("distribution"), list(spec.get("params", []))
+    elif isinstance(spec, list) and spec:
+        distribution, params = spec[0], spec[1:]
+    else:
+        raise ValueError(f"invalid delay of transition {name}: {spec!r}")
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"unknown distribution {distribution!r} of transition {name}")
+    try:
+        return DISTRIBUTIONS[distribution](*params)
+    except TypeError:
+        raise ValueError(f"invalid parameters {params!r} of {distribution} of transition {name}") from None
+
+
+def _delay_spec(delay: Distribution) -> list:
+    """Get the list form of a delay"""
+    return [type(delay).__name__, *delay.params]
+
+
+def _arcs(spec: dict[str, int], index: dict[str, int], name: str) -> tuple[tuple[int, int], ...]:
+    """Get arcs of a transition as pairs of place indices and multiplicities"""
+    arcs = []
+    for place, k in spec.items():
+        if place not in index:
+            raise ValueError(f"unknown place {place} of transition {name}")
+        arcs.append((index[place], _count(k, f"multiplicity of arc {place} of transition {name}", 1)))
+    return tuple(arcs)
+
+
+def _result(spec: Any, names: dict[str, tuple[str, int]], name: str) -> Mean | Share:
+    """Get a result given by {mean, per} or {share, of}"""
+    if not isinstance(spec, dict) or ("mean" in spec) == ("share" in spec):
+        raise ValueError(f"result {name} must give either mean or share, got {spec!r}")
+    if "mean" in spec:
+        if spec["mean"] not in names:
+            raise ValueError(f"unknown element {spec['mean']} of result {name}")
+        return Mean(*names[spec["mean"]], float(spec.get("per", 1.)))
+    places = []
+    for key in ("share", "of"):
+        places.append([])
+        for element in spec.get(key, []):
+            if names.get(element, ('',))[0] != 'place':
+                raise ValueError(f"unknown place {element} of result {name}")
+            places[-1].append(names[element][1])
+    if not places[1]:
+        raise ValueError(f"result {name} must give places the share is of")
+    return Share(tuple(places[0]), tuple(places[1]))
+
+
+def _result_spec(result: Mean | Share, places: list[str], transitions: list[str]) -> dict[str, Any]:
+    """Get the dict form of a result"""
+    if isinstance(result, Mean):
+        return {"mean": (places if result.kind == 'place' else transitions)[result.index], "per": result.per}
+    return {"share": [places[p] for p in result.places], "of": [places[p] for p in result.of]}
@@ -0,0 +1,108 @@
+import ast
+import json
+import mmap
+import sys
+from array import array
+from typing import Iterable
+from result_sink import ResultSink
+
+
+class NPYWriter(ResultSink):
+    """
+    Writer of rows as float64 columns into a .npy file
+
+    Rows are gathered into columns and written on close as a Fortran ordered
+    two-dimensional float64 array, so every statistic is stored contiguously.
+    Names of the columns are saved into a .json file next to the .npy one.
+    The file can be read memory-mapped with NPYWriter.read or numpy.load(filename, mmap_mode='r').
+    """
+    extension = 'npy'
+    MAGIC = b'\x93NUMPY'
+
+    def __init__(self, filename: str, header: Iterable[str] | None = None) -> None:
+        super().__init__(filename)
+        self.names: list[str] = []
+        self.columns: list[array] = []
+        self.closed = False
+
+        if header is not None:
+            self.write_header(header)
+
+    def write_header(self, header: Iterable[str]) -> None:
+        """Set names of the columns"""
+        self.names = [str(name) for name in header]
+        self.columns = [array('d') for _ in self.names]
+        self.has_header = True
+
+    def write(self, data: Iterable) -> None:
+        """Append data as a row"""
+        data = list(data)
+        if not self.columns:
+            self.columns = [array('d') for _ in data]
+        for column, value in zip(self.columns, data, strict=True):
+            column.append(value)
+
+    def close(self) -> None:
+        """Write the gathered columns into the file"""
+        if self.closed:
+            return
+        self.closed = True
+
+        rows = len(self.columns[0]) if self.columns else 0
+        header = repr({'descr': '<f8', 'fortran_order': True, 'shape': (rows, len(self.columns))})
+        # data is aligned to 64 bytes after the magic, version, header length and header
+        header += ' ' * (-(len(self.MAGIC) + 4 + len(header) + 1) % 64) + '\n'
+
+        with open(self.filename, 'wb') as f:
+            f.write(self.MAGIC + bytes([1, 0]) + len(header).to_bytes(2, 'little') + header.encode('latin1'))
+            for column in self.columns:
+                if sys.byteorder == 'big':
+                    column = array('d', column)
+                    column.byteswap()
+                column.tofile(f)
+
+        with open(self._names_filename(self.filename), 'w', encoding='utf-8') as f:
+            json.dump(self.names, f, ensure_ascii=False)
+
+    @staticmethod
+    def read(filename: str) -> dict[str, memoryview]:
+        """
+        Map the file written by NPYWriter into memory
+
+        Parameters
+        ----------
+        filename : str
+            name of the .npy file
+
+        Returns
+        -------
+        dict[str, memoryview]
+            columns of float64 values by names without copying them from the mapped file
+        """
+        with open(filename, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if data[:len(NPYWriter.MAGIC)] != NPYWriter.MAGIC:
+            raise ValueError(f"{filename} is not a .npy file")
+        major = data[len(NPYWriter.MAGIC)]
+        size = 2 if major == 1 else 4
+        start = len(NPYWriter.MAGIC) + 2
+        length = int.from_bytes(data[start:start + size], 'little')
+        header = ast.literal_eval(data[start + size:start + size + length].decode('latin1'))
+        if header['descr'] != '<f8' or len(header['shape']) != 2 or sys.byteorder == 'big':
+            raise ValueError(f"{filename} does not hold a little-endian float64 matrix")
+
+        rows, cols = header['shape']
+        values = memoryview(data)[start + size + length:].cast('d')
+
+        with open(NPYWriter._names_filename(filename), encoding='utf-8') as f:
+            names = json.load(f)
+
+        if header['fortran_order']:
+            return {name: values[j * rows:(j + 1) * rows] for j, name in enumerate(names)}
+        return {name: values[j::cols] for j, name in enumerate(names)}
+
+    @staticmethod
+    def _names_filename(filename: str) -> str:
+        """Get the name of the file with names of the columns"""
+        return filename.removesuffix('.npy') + '.json'
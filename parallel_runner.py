@@ -0,0 +1,181 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Optional
+from elements import Numeric
+from model import Model
+from random_functions import RandomFunctions
+from accumulators import batch_means_interval
+from csv_saver import CSVWriter
+from result_sink import ResultSink
+import random
+
+
+ModelFactory = Callable[[], Model]
+
+
+def _simulate(task: tuple) -> dict[str, float]:
+    """Simulate a model built by factory with its own seed, save the result if filename given"""
+    factory, seed, sim_time, warmup_time, filename, state, common_random_numbers = task
+    model = factory()
+    if state is not None:
+        model.load_state(state)
+    # set after loading, which restores the flag of the saved model
+    model.common_random_numbers = common_random_numbers
+    result = model.simulate(sim_time, warmup_time, False, False, seed)
+    if filename:
+        with CSVWriter(filename, result) as writer:
+            writer.write(result.values())
+    return result
+
+
+def _simulate_intervals(task: tuple) -> None:
+    """Simulate a model built by factory with its own seed saving stats every interval"""
+    factory, seed, sim_time, interval, warmup_time, name, sink = task
+    factory().simulate_intervals(sim_time, interval, warmup_time, name, seed, sink)
+
+
+class ParallelRunner:
+    """
+    Runner of model simulations over a pool of processes
+
+    Models are built in the workers by picklable factories, e.g. model classes or
+    functools.partial of them. Every run gets a seed derived from the runner's seed
+    and the run's index, so results are reproducible regardless of the number of
+    workers, and results are returned in the order of runs.
+    """
+    def __init__(self, workers: Optional[int] = None, seed: Optional[int] = None) -> None:
+        self.workers = workers
+        self.seed = seed if seed is not None else random.getrandbits(64)
+
+    def run(self,
+            factories: Iterable[ModelFactory],
+            sim_time: Numeric,
+            warmup_time: Numeric = 0,
+            name: Optional[str] = None,
+            state: Optional[bytes] = None,
+            seeds: Optional[list[int]] = None,
+            common_random_numbers: bool = False) -> list[dict[str, float]]:
+        """
+        Simulate one model built by every factory
+
+        Parameters
+        ----------
+        factories : Iterable[ModelFactory]
+            picklable callables returning models to simulate
+        sim_time : Numeric
+            time of simulation after warmup if specified
+        warmup_time : Numeric
+            time of warmup, no warmup is performed when 0
+        name : Optional[str]
+            when given every run saves its result into {name}-{i}-result.csv
+        state : Optional[bytes]
+            state returned by Model.save_state every model starts from with its own seed
+        seeds : Optional[list[int]]
+            seeds of the runs, derived from the runner's seed and indices of runs when None
+        common_random_numbers : bool
+            whether models draw delays of every transition from its own stream, see Model.seed
+
+        Returns
+        -------
+        list[dict[str, float]]
+            simulation results in the order of factories
+        """
+        tasks = [
+            (factory, seeds[i] if seeds is not None else self._seed(i), sim_time, warmup_time, f"{name}-{i}-result.csv" if name else None, state,
+             common_random_numbers)
+            for i, factory in enumerate(factories)
+        ]
+        return self._map(_simulate, tasks)
+
+    def replicate(self,
+                  factory: ModelFactory,
+                  n: int,
+                  sim_time: Numeric,
+                  warmup_time: Numeric = 0,
+                  name: Optional[str] = None,
+                  warm_start: bool = False) -> list[dict[str, float]]:
+        """
+        Simulate n independent replications of the model built by factory
+
+        With warm_start the warmup is simulated once and every replication
+        continues from the saved state with its own seed.
+        """
+        if not warm_start or not warmup_time:
+            return self.run([factory] * n, sim_time, warmup_time, name)
+        model = factory()
+        model.seed(RandomFunctions.derive_seed(self.seed, 'warmup'))
+        model._warmup(warmup_time)
+        return self.run([factory] * n, sim_time, 0, name, model.save_state())
+
+    def compare(self,
+                factory: ModelFactory,
+                alternative: ModelFactory,
+                n: int,
+                sim_time: Numeric,
+                warmup_time: Numeric = 0,
+                level: float = 0.95,
+                common_random_numbers: bool = True) -> dict[str, tuple[float, float]]:
+        """
+        Compare two configurations of a model by n paired replications
+
+        Replication i of both configurations gets the same seed, with common random
+        numbers every transition draws its delays from its own stream, so both
+        configurations see the same arrivals and service times and the variance of
+        differences is much lower than of independent runs.
+
+        Parameters
+        ----------
+        factory : ModelFactory
+            picklable callable returning models of the baseline configuration
+        alternative : ModelFactory
+            picklable callable returning models of the compared configuration
+        n : int
+            number of pairs of replications
+        sim_time : Numeric
+            time of simulation after warmup if specified
+        warmup_time : Numeric
+            time of warmup, no warmup is performed when 0
+        level : float
+            confidence level of the intervals
+        common_random_numbers : bool
+            whether to use common random numbers, pairs only share seeds otherwise
+
+        Returns
+        -------
+        dict[str, tuple[float, float]]
+            mean difference of every output variable of the alternative from the
+            baseline and the half-width of its confidence interval
+        """
+        seeds = [self._seed(i) for i in range(n)]
+        results = self.run([factory] * n + [alternative] * n, sim_time, warmup_time,
+                           seeds=seeds + seeds, common_random_numbers=common_random_numbers)
+        return {
+            k: batch_means_interval([b[k] - a[k] for a, b in zip(results[:n], results[n:])], level)
+            for k in results[0]
+        }
+
+    def replicate_intervals(self,
+                            factory: ModelFactory,
+                            n: int,
+                            sim_time: Numeric,
+                            interval: Numeric,
+                            warmup_time: Numeric = 0,
+                            name: Optional[str] = None,
+                            sink: type[ResultSink] = CSVWriter) -> None:
+        """Perform simulate_intervals of n independent replications saving {name}-{i}-result files with sink"""
+        name = name if name else getattr(factory, '__name__', Model.__name__)
+        tasks = [
+            (factory, self._seed(i), sim_time, interval, warmup_time, f"{name}-{i}", sink)
+            for i in range(n)
+        ]
+        self._map(_simulate_intervals, tasks)
+
+    def _seed(self, i: int) -> int:
+        """Get the seed of the i-th run"""
+        return RandomFunctions.derive_seed(self.seed, i)
+
+    def _map(self, function: Callable, tasks: list[tuple]) -> list:
+        """Apply function to tasks in the pool keeping the order of tasks"""
+        if self.workers == 1:
+            return [function(task) for task in tasks]
+        with ProcessPoolExecutor(self.workers) as executor:
+            return list(executor.map(function, tasks))
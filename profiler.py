@@ -0,0 +1,51 @@
+from typing import Any
+from elements import Transition
+import json
+
+
+class Profiler:
+    """
+    Counters of where simulation time goes, gathered while attached to Model.profiler
+
+    Wall time is accumulated with perf_counter_ns per phase of a simulation step:
+    input of transitions with conflict resolution, search of the next event time,
+    closing batches of statistics and output of events. Time-weighted statistics are
+    observed within input and output, so their cost is counted there.
+    """
+    PHASES = ('input', 'find_next_t', 'stats', 'output')
+
+    def __init__(self, transitions: list[Transition]) -> None:
+        self.names = [t.name for t in transitions]
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear every counter"""
+        self.phases: dict[str, int] = dict.fromkeys(self.PHASES, 0)
+        self.firings: list[int] = [0] * len(self.names)
+        self.rounds = 0
+        self.conflicts = 0
+        self.steps = 0
+        self.events = 0
+        self.wall = 0
+
+    def report(self) -> dict[str, Any]:
+        """Get the counters with wall times in seconds"""
+        wall = self.wall / 1e9
+        return {
+            "events": self.events,
+            "steps": self.steps,
+            "wall_time": wall,
+            "events_per_second": self.events / wall if wall else 0.,
+            "phases": {phase: ns / 1e9 for phase, ns in self.phases.items()},
+            "phase_shares": {phase: ns / self.wall if self.wall else 0. for phase, ns in self.phases.items()},
+            "firings": dict(zip(self.names, self.firings)),
+            "resolution_rounds": self.rounds,
+            "conflicts": self.conflicts,
+            "rounds_per_step": self.rounds / self.steps if self.steps else 0.,
+            "events_per_step": self.events / self.steps if self.steps else 0.,
+        }
+
+    def save(self, filename: str) -> None:
+        """Save the report into a json file"""
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
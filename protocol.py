@@ -0,0 +1,135 @@
+import json
+import sys
+from collections import deque
+from typing import Any, Optional, TextIO
+
+
+class ProtocolSink:
+    """Destination of protocol records"""
+    def emit(self, record: dict[str, Any]) -> None:
+        """Write the record"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release resources of the sink"""
+        pass
+
+
+class NullSink(ProtocolSink):
+    """Sink discarding every record"""
+    def emit(self, record: dict[str, Any]) -> None:
+        pass
+
+
+class RingBufferSink(ProtocolSink):
+    """Sink keeping only the last capacity records in memory"""
+    def __init__(self, capacity: int = 1000) -> None:
+        self.records: deque[dict[str, Any]] = deque(maxlen=capacity)
+
+    def emit(self, record: dict[str, Any]) -> None:
+        self.records.append(record)
+
+
+class PrintSink(ProtocolSink):
+    """Sink writing records as human readable text, to stdout by default"""
+    def __init__(self, file: Optional[TextIO] = None) -> None:
+        self.file = file
+
+    def emit(self, record: dict[str, Any]) -> None:
+        print(self.format(record), file=self.file or sys.stdout)
+
+    @staticmethod
+    def format(record: dict[str, Any]) -> str:
+        """Format the record as text"""
+        match record['event']:
+            case 'enabled':
+                if not record['transitions']:
+                    return "No enabled transitions"
+                return "Enabled transitions:\n" + "\n".join(
+                    f"{t['name']} {t['priority']} {t['probability']}" for t in record['transitions']
+                )
+            case 'chose':
+                return f"Chose {record['transition']}"
+            case 'next':
+                return f"It's time for event in {record['transition']}, time = {record['next_t']}"
+            case 'state':
+                return "\n".join([
+                    f"\n{record['heading']}",
+                    *(f"{name} n = {n}" for name, n in record['marking'].items()),
+                    *(f"{name} next_ts = {ts}" for name, ts in record['next_ts'].items()),
+                    ""
+                ])
+            case _:
+                return str(record)
+
+
+class FileSink(PrintSink):
+    """Sink writing records as human readable text into a file"""
+    def __init__(self, filename: str) -> None:
+        super().__init__(open(filename, 'w', encoding='utf-8'))
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class JSONLinesSink(ProtocolSink):
+    """Sink writing every record as a json line into a file"""
+    def __init__(self, filename: str) -> None:
+        self.file = open(filename, 'w', encoding='utf-8')
+
+    def emit(self, record: dict[str, Any]) -> None:
+        self.file.write(json.dumps(record, ensure_ascii=False))
+        self.file.write('\n')
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class Protocol:
+    """
+    Protocol of simulation events written into a sink
+
+    Verbosity selects the records written: EVENTS gives chosen transitions and
+    the next events, CONFLICTS adds sets of enabled transitions and STATE adds
+    the state of the model after every input and output.
+    """
+    EVENTS, CONFLICTS, STATE = 1, 2, 3
+
+    def __init__(self, sink: Optional[ProtocolSink] = None, verbosity: int = STATE) -> None:
+        self.sink = sink if sink else PrintSink()
+        self.verbosity = verbosity
+
+    def enabled(self, curr_t: float, transitions: list) -> None:
+        """Record transitions enabled before conflict resolution"""
+        if self.verbosity >= self.CONFLICTS:
+            self.sink.emit({
+                'event': 'enabled',
+                'time': curr_t,
+                'transitions': [
+                    {'name': t.name, 'priority': t.priority, 'probability': t.probability} for t in transitions
+                ]
+            })
+
+    def chose(self, curr_t: float, transition) -> None:
+        """Record the transition chosen to input"""
+        if self.verbosity >= self.EVENTS:
+            self.sink.emit({'event': 'chose', 'time': curr_t, 'transition': transition.name})
+
+    def next_event(self, curr_t: float, next_t: float, transition) -> None:
+        """Record the nearest event"""
+        if self.verbosity >= self.EVENTS:
+            self.sink.emit({
+                'event': 'next', 'time': curr_t, 'next_t': next_t,
+                'transition': transition.name if transition else None
+            })
+
+    def state(self, curr_t: float, heading: str, marking: dict[str, int], next_ts: dict[str, list[float]]) -> None:
+        """Record the state of the model"""
+        if self.verbosity >= self.STATE:
+            self.sink.emit({
+                'event': 'state', 'time': curr_t, 'heading': heading, 'marking': marking, 'next_ts': next_ts
+            })
+
+    def close(self) -> None:
+        """Close the sink"""
+        self.sink.close()
@@ -0,0 +1,36 @@
+from types import TracebackType
+from typing import Iterable, Optional
+
+
+class ResultSink:
+    """
+    Destination of rows of statistical data written during simulation
+
+    Subclasses set extension to the extension of the files they write.
+    """
+    extension: str = ''
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.has_header = False
+
+    def write_header(self, header: Iterable[str]) -> None:
+        """Write names of the columns"""
+        raise NotImplementedError
+
+    def write(self, data: Iterable) -> None:
+        """Write data as a row"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Write everything left and release the file"""
+        raise NotImplementedError
+
+    def __enter__(self) -> 'ResultSink':
+        return self
+
+    def __exit__(self,
+                 exc_type: Optional[type[BaseException]],
+                 exc: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.close()
@@ -1,165 +1,124 @@
-from elements import Place, Transition
-from random_functions import RandomFunctions as rf
+from functools import lru_cache
+from typing import Any
+from random_functions import Constant, Distribution, Exponential, Normal, Triangular, Uniform
+from net_definition import NetTemplate
 from model import Model
 
 
+def definition(first_auto_line_capacity: int,
+               second_auto_line_capacity: int,
+               indoors_line_capacity: int,
+               first_cashier_time: Distribution,
+               second_cashier_time: Distribution,
+               indoors_cashier_time: Distribution,
+               indoors_cashiers: int,
+               auto_generator_time: Distribution,
+               indoors_generator_time: Distribution,
+               indoors_cashier_delay_time: Distribution) -> dict[str, Any]:
+    """Get the definition of the net of the bank with the given parameters"""
+    return {
+        "places": [
+            {"name": 'p0', "marking": 1},
+            {"name": 'До авт. касирів'},
+            {"name": 'Черга до 1 авт. касира', "capacity": first_auto_line_capacity},
+            {"name": '1 авт. касир вільний', "marking": 1},
+            {"name": 'Вхід до 1 авт. касира'},
+            {"name": 'Кількість обслугованих 1 авт. касиром'},
+            {"name": 'Черга до 2 авт. касира', "capacity": second_auto_line_capacity},
+            {"name": '2 авт. касир вільний', "marking": 1},
+            {"name": 'Вхід до 2 авт. касира'},
+            {"name": 'Кількість обслугованих 2 авт. касиром'},
+            {"name": 'p1', "marking": 1},
+            {"name": 'До касирів у приміщенні'},
+            {"name": 'Черга до касирів у приміщенні', "capacity": indoors_line_capacity},
+            {"name": 'Вільних касирів у приміщенні'},
+            {"name": 'Вхід до касирів у приміщенні'},
+            {"name": 'Кількість обслугованих касирами у приміщенні'},
+            {"name": 'p2', "marking": 1},
+            {"name": 'Втрачено'},
+        ],
+        "transitions": [
+            {"name": 'Надходження до авт. касирів', "delay": auto_generator_time,
+             "in": {'p0': 1}, "out": {'p0': 1, 'До авт. касирів': 1}},
+
+            {"name": 'Надходження до 1 авт. черги', "priority": 1, "probability": 0.5,
+             "in": {'До авт. касирів': 1}, "out": {'Черга до 1 авт. касира': 1}},
+            {"name": 'Вихід з черги 1 авт. касира',
+             "in": {'Черга до 1 авт. касира': 1, '1 авт. касир вільний': 1}, "out": {'Вхід до 1 авт. касира': 1}},
+            {"name": 'Обслуговування 1 авт. касиром', "delay": first_cashier_time,
+             "in": {'Вхід до 1 авт. касира': 1},
+             "out": {'1 авт. касир вільний': 1, 'Кількість обслугованих 1 авт. касиром': 1}},
+
+            {"name": 'Надходження до 2 авт. черги', "priority": 1, "probability": 0.5,
+             "in": {'До авт. касирів': 1}, "out": {'Черга до 2 авт. касира': 1}},
+            {"name": 'Вихід з черги 2 авт. касира',
+             "in": {'Черга до 2 авт. касира': 1, '2 авт. касир вільний': 1}, "out": {'Вхід до 2 авт. касира': 1}},
+            {"name": 'Обслуговування 2 авт. касиром', "delay": second_cashier_time,
+             "in": {'Вхід до 2 авт. касира': 1},
+             "out": {'2 авт. касир вільний': 1, 'Кількість обслугованих 2 авт. касиром': 1}},
+
+            {"name": 'Надходження до касирів у приміщенні', "delay": indoors_generator_time,
+             "in": {'p1': 1}, "out": {'p1': 1, 'До касирів у приміщенні': 1}},
+            {"name": 'Надходження до черги в приміщенні', "priority": 1,
+             "in": {'До касирів у приміщенні': 1}, "out": {'Черга до касирів у приміщенні': 1}},
+            {"name": 'Вихід з черги до касирів у приміщенні',
+             "in": {'Черга до касирів у приміщенні': 1, 'Вільних касирів у приміщенні': 1},
+             "out": {'Вхід до касирів у приміщенні': 1}},
+            {"name": 'Обслуговування касирами у приміщенні', "delay": indoors_cashier_time,
+             "in": {'Вхід до касирів у приміщенні': 1},
+             "out": {'Вільних касирів у приміщенні': 1, 'Кількість обслугованих касирами у приміщенні': 1}},
+
+            {"name": 'Затримка перед початком роботи', "delay": indoors_cashier_delay_time,
+             "in": {'p2': 1}, "out": {'Вільних касирів у приміщенні': indoors_cashiers}},
+            {"name": 'Перехід до приміщення', "in": {'До авт. касирів': 1}, "out": {'До касирів у приміщенні': 1}},
+            {"name": 'Вихід з банку', "in": {'До касирів у приміщенні': 1}, "out": {'Втрачено': 1}},
+        ],
+        "tracked": [
+            'Обслуговування 1 авт. касиром', 'Обслуговування 2 авт. касиром', 'Обслуговування касирами у приміщенні',
+            'Черга до 1 авт. касира', 'Черга до 2 авт. касира', 'Черга до касирів у приміщенні',
+        ],
+        "counters": [
+            'Втрачено', 'Кількість обслугованих 1 авт. касиром', 'Кількість обслугованих 2 авт. касиром',
+            'Кількість обслугованих касирами у приміщенні',
+        ],
+        "results": {
+            "First auto cashier mean load time": {"mean": 'Обслуговування 1 авт. касиром'},
+            "Second auto cashier mean load time": {"mean": 'Обслуговування 2 авт. касиром'},
+            "Indoors cashiers mean load time": {"mean": 'Обслуговування касирами у приміщенні', "per": indoors_cashiers},
+            "First auto line mean size": {"mean": 'Черга до 1 авт. касира'},
+            "Second auto line mean size": {"mean": 'Черга до 2 авт. касира'},
+            "Indoors line mean size": {"mean": 'Черга до касирів у приміщенні'},
+            "Lose probability": {
+                "share": ['Втрачено'],
+                "of": ['Втрачено', 'Кількість обслугованих 1 авт. касиром', 'Кількість обслугованих 2 авт. касиром',
+                       'Кількість обслугованих касирами у приміщенні'],
+            },
+        },
+    }
+
+
+@lru_cache(maxsize=64)
+def template(*params: Any) -> NetTemplate:
+    """Get the template of the net with the parameters of definition, compiled once for equal parameters"""
+    return NetTemplate(definition(*params))
+
+
 class StandardModel(Model):
     def __init__(
         self,
         first_auto_line_capacity = 3,
         second_auto_line_capacity = 4,
         indoors_line_capacity = 7,
-        first_cashier_time = lambda: rf.normal(0.5, 0.25),
-        second_cashier_time = lambda: rf.uniform(0.6, 0.4),
-        indoors_cashier_time = lambda: rf.triang(0.1, 1.2, 0.4),
+        first_cashier_time = Normal(0.5, 0.25),
+        second_cashier_time = Uniform(0.6, 0.4),
+        indoors_cashier_time = Triangular(0.1, 1.2, 0.4),
         indoors_cashiers = 2,
-        auto_generator_time = lambda: rf.exponential(0.75),
-        indoors_generator_time = lambda: rf.exponential(0.5),
-        indoors_cashier_delay_time = lambda: 60
+        auto_generator_time = Exponential(0.75),
+        indoors_generator_time = Exponential(0.5),
+        indoors_cashier_delay_time = Constant(60)
 ) -> None:
-        p0 = Place('p0', 1)
-        auto_generator = Transition('Надходження до авт. касирів', auto_generator_time)
-        to_auto_lines = Place('До авт. касирів')
-
-        first_auto_line_entry = Transition('Надходження до 1 авт. черги', priority=1, probability=0.5)
-        first_auto_line_free_places = Place('Кількість вільних місць у 1 авт. черзі', first_auto_line_capacity)
-        first_auto_line = Place('Черга до 1 авт. касира')
-        first_auto_line_exit = Transition('Вихід з черги 1 авт. касира')
-        first_auto_cashier_free = Place('1 авт. касир вільний', 1)
-        first_auto_cashier_entry = Place('Вхід до 1 авт. касира')
-        first_auto_cashier_serve = Transition('Обслуговування 1 авт. касиром', first_cashier_time)
-        first_auto_cashier_served = Place('Кількість обслугованих 1 авт. касиром')
-
-        second_auto_line_entry = Transition('Надходження до 2 авт. черги', priority=1, probability=0.5)
-        second_auto_line_free_places = Place('Кількість вільних місць у 2 авт. черзі', second_auto_line_capacity)
-        second_auto_line = Place('Черга до 2 авт. касира')
-        second_auto_line_exit = Transition('Вихід з черги 2 авт. касира')
-        second_auto_cashier_free = Place('2 авт. касир вільний', 1)
-        second_auto_cashier_entry = Place('Вхід до 2 авт. касира')
-        second_auto_cashier_serve = Transition('Обслуговування 2 авт. касиром', second_cashier_time)
-        second_auto_cashier_served = Place('Кількість обслугованих 2 авт. касиром')
-
-        auto_generator.add_inplace(p0)
-        auto_generator.add_outplace(p0)
-        auto_generator.add_outplace(to_auto_lines)
-
-        first_auto_line_entry.add_inplace(to_auto_lines)
-        first_auto_line_entry.add_inplace(first_auto_line_free_places)
-        first_auto_line_entry.add_outplace(first_auto_line)
-
-        first_auto_line_exit.add_inplace(first_auto_line)
-        first_auto_line_exit.add_inplace(first_auto_cashier_free)
-        first_auto_line_exit.add_outplace(first_auto_line_free_places)
-        first_auto_line_exit.add_outplace(first_auto_cashier_entry)
-
-        first_auto_cashier_serve.add_inplace(first_auto_cashier_entry)
-        first_auto_cashier_serve.add_outplace(first_auto_cashier_free)
-        first_auto_cashier_serve.add_outplace(first_auto_cashier_served)
-
-
-        second_auto_line_entry.add_inplace(to_auto_lines)
-        second_auto_line_entry.add_inplace(second_auto_line_free_places)
-        second_auto_line_entry.add_outplace(second_auto_line)
-
-        second_auto_line_exit.add_inplace(second_auto_line)
-        second_auto_line_exit.add_inplace(second_auto_cashier_free)
-        second_auto_line_exit.add_outplace(second_auto_line_free_places)
-        second_auto_line_exit.add_outplace(second_auto_cashier_entry)
-
-        second_auto_cashier_serve.add_inplace(second_auto_cashier_entry)
-        second_auto_cashier_serve.add_outplace(second_auto_cashier_free)
-        second_auto_cashier_serve.add_outplace(second_auto_cashier_served)
-
-        p1 = Place('p1', 1)
-        indoors_generator = Transition('Надходження до касирів у приміщенні', indoors_generator_time)
-        to_indoors_lines = Place('До касирів у приміщенні')
-
-        indoors_line_entry = Transition('Надходження до черги в приміщенні', priority=1)
-        indoors_line_free_places = Place('Кількість вільних місць у черзі в приміщенні', indoors_line_capacity)
-        indoors_line = Place('Черга до касирів у приміщенні')
-        indoors_line_exit = Transition('Вихід з черги до касирів у приміщенні')
-        indoors_cashier_free = Place('Вільних касирів у приміщенні')
-        indoors_cashier_entry = Place('Вхід до касирів у приміщенні')
-        indoors_cashier_serve = Transition('Обслуговування касирами у приміщенні', indoors_cashier_time)
-        indoors_cashier_served = Place('Кількість обслугованих касирами у приміщенні')
-
-        indoors_generator.add_inplace(p1)
-        indoors_generator.add_outplace(p1)
-        indoors_generator.add_outplace(to_indoors_lines)
-
-        indoors_line_entry.add_inplace(to_indoors_lines)
-        indoors_line_entry.add_inplace(indoors_line_free_places)
-        indoors_line_entry.add_outplace(indoors_line)
-
-        indoors_line_exit.add_inplace(indoors_line)
-        indoors_line_exit.add_inplace(indoors_cashier_free)
-        indoors_line_exit.add_outplace(indoors_line_free_places)
-        indoors_line_exit.add_outplace(indoors_cashier_entry)
-
-        indoors_cashier_serve.add_inplace(indoors_cashier_entry)
-        indoors_cashier_serve.add_outplace(indoors_cashier_free)
-        indoors_cashier_serve.add_outplace(indoors_cashier_served)
-
-        p2 = Place('p2', 1)
-        indoors_cashier_delay = Transition('Затримка перед початком роботи', indoors_cashier_delay_time)
-        indoors_cashier_delay.add_inplace(p2)
-        indoors_cashier_delay.add_outplace(indoors_cashier_free, indoors_cashiers)
-
-        transfer_indoors = Transition('Перехід до приміщення')
-        transfer_indoors.add_inplace(to_auto_lines)
-        transfer_indoors.add_outplace(to_indoors_lines)
-
-        lost = Place('Втрачено')
-        transfer_lost = Transition('Вихід з банку')
-        transfer_lost.add_inplace(to_indoors_lines)
-        transfer_lost.add_outplace(lost)
-
-
-        ts = [
-            auto_generator,
-            first_auto_line_entry, first_auto_line_exit, first_auto_cashier_serve,
-            second_auto_line_entry, second_auto_line_exit, second_auto_cashier_serve,
-            indoors_generator,
-            indoors_line_entry, indoors_line_exit, indoors_cashier_serve,
-            indoors_cashier_delay, transfer_indoors, transfer_lost
-        ]
-
-        ps = [
-            p0, to_auto_lines,
-            first_auto_line_free_places, first_auto_line, first_auto_cashier_free, first_auto_cashier_entry, first_auto_cashier_served,
-            second_auto_line_free_places, second_auto_line, second_auto_cashier_free, second_auto_cashier_entry, second_auto_cashier_served,
-            p1, to_indoors_lines,
-            indoors_line_free_places, indoors_line, indoors_cashier_free, indoors_cashier_entry, indoors_cashier_served,
-            p2, lost
-
-        ]
-
-        self.m11 = first_auto_cashier_serve
-        self.m12 = second_auto_cashier_serve
-        self.m2 = indoors_cashier_serve
-
-        self.q11 = first_auto_line
-        self.q12 = second_auto_line
-        self.q2 = indoors_line
-
-        self.n11 = first_auto_cashier_served
-        self.n12 = second_auto_cashier_served
-        self.n2 = indoors_cashier_served
-        self.n0 = lost
-
-        self.indoors_cashiers = indoors_cashiers
-
-        super().__init__(ps, ts)
-
-    def _calc_stats(self) -> dict[str, float]:
-        """Calculate output vars"""
-        result = {}
-        result["First auto cashier mean load time"] = self.m11.mean
-        result["Second auto cashier mean load time"] = self.m12.mean
-        result["Indoors cashiers mean load time"] = self.m2.mean / self.indoors_cashiers
-        result["First auto line mean size"] = self.q11.mean
-        result["Second auto line mean size"] = self.q12.mean
-        result["Indoors line mean size"] = self.q2.mean
-        result["Lose probability"] = self.n0.n / (self.n0.n + self.n11.n + self.n12.n + self.n2.n)
-        return result
-
+        super().__init__(**template(
+            first_auto_line_capacity, second_auto_line_capacity, indoors_line_capacity,
+            first_cashier_time, second_cashier_time, indoors_cashier_time, indoors_cashiers,
+            auto_generator_time, indoors_generator_time, indoors_cashier_delay_time
+        ).arguments())
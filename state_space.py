@@ -0,0 +1,342 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+from array import array
+from compiled_net import CompiledNet
+from model import Model
+import json
+import os
+import sqlite3
+import tempfile
+
+
+# marking or load that grows without bound, the largest value of a packed state
+OMEGA = 2 ** 31 - 1
+
+
+class MarkingStore:
+    """
+    Set of packed states numbered in the order of addition, with the state each was reached from
+
+    States are kept in a dict until max_memory states, then they are moved into an
+    sqlite database at filename, a temporary file when None, and kept there.
+    """
+    def __init__(self, max_memory: int = 1_000_000, filename: Optional[str] = None) -> None:
+        self.max_memory = max_memory
+        self.filename = filename
+        self._index: dict[bytes, int] = {}
+        self._states: list[bytes] = []
+        self._parents = array('q')
+        self._db: Optional[sqlite3.Connection] = None
+        self._size = 0
+
+    @property
+    def spilled(self) -> bool:
+        return self._db is not None
+
+    def add(self, state: bytes, parent: int) -> Optional[int]:
+        """Add a state reached from parent, get its number or None when it is already stored"""
+        if self._db is None:
+            if state in self._index:
+                return None
+            if self._size < self.max_memory:
+                self._index[state] = self._size
+                self._states.append(state)
+                self._parents.append(parent)
+                self._size += 1
+                return self._size - 1
+            self._spill()
+        if self._db.execute("INSERT OR IGNORE INTO states VALUES (?, ?, ?)", (self._size, state, parent)).rowcount:
+            self._size += 1
+            return self._size - 1
+        return None
+
+    def get(self, number: int) -> tuple[bytes, int]:
+        """Get a state and the number of the state it was reached from, -1 for initial states"""
+        if self._db is None:
+            return self._states[number], self._parents[number]
+        return self._db.execute("SELECT state, parent FROM states WHERE id = ?", (number,)).fetchone()
+
+    def close(self) -> None:
+        """Drop the database of spilled states"""
+        if self._db is not None:
+            self._db.close()
+            os.remove(self.filename)
+            self._db = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _spill(self) -> None:
+        """Move the states into the database"""
+        if self.filename is None:
+            handle, self.filename = tempfile.mkstemp(suffix='.sqlite')
+            os.close(handle)
+        self._db = sqlite3.connect(self.filename)
+        self._db.execute("DROP TABLE IF EXISTS states")
+        self._db.execute("CREATE TABLE states (id INTEGER PRIMARY KEY, state BLOB UNIQUE, parent INTEGER)")
+        self._db.executemany("INSERT INTO states VALUES (?, ?, ?)", zip(range(self._size), self._states, self._parents))
+        self._index, self._states, self._parents = {}, [], array('q')
+
+
+class StateSpace:
+    """
+    Result of exploration of the states of a net, sinks of the net are left out of states and listed
+    """
+    def __init__(self,
+                 states: int,
+                 edges: int,
+                 depth: int,
+                 dead: int,
+                 dead_markings: list[dict[str, int]],
+                 unbounded_places: list[str],
+                 unbounded_transitions: list[str],
+                 sinks: list[str],
+                 complete: bool,
+                 spilled: bool) -> None:
+        self.states = states
+        self.edges = edges
+        self.depth = depth
+        self.dead = dead
+        self.dead_markings = dead_markings
+        self.unbounded_places = unbounded_places
+        self.unbounded_transitions = unbounded_transitions
+        self.sinks = sinks
+        self.complete = complete
+        self.spilled = spilled
+
+    @property
+    def bounded(self) -> bool:
+        return self.complete and not self.unbounded_places and not self.unbounded_transitions
+
+    def report(self) -> dict[str, Any]:
+        """Get the results as a dict"""
+        return {
+            "states": self.states,
+            "edges": self.edges,
+            "depth": self.depth,
+            "dead": self.dead,
+            "dead_markings": self.dead_markings,
+            "unbounded_places": self.unbounded_places,
+            "unbounded_transitions": self.unbounded_transitions,
+            "sinks": self.sinks,
+            "bounded": self.bounded,
+            "complete": self.complete,
+            "spilled": self.spilled,
+        }
+
+    def save(self, filename: str) -> None:
+        """Save the report into a json file"""
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
+
+
+def explore(model: Model,
+            max_states: int = 200_000,
+            max_memory: int = 1_000_000,
+            spill: Optional[str] = None,
+            workers: int = 1,
+            max_dead: int = 10) -> StateSpace:
+    """
+    Explore breadth-first the states of the net of a model from its initial marking
+
+    A state is the marking of places and the loads of transitions once no transition
+    is enabled, as in the simulation: enabled transitions are input one by one taking
+    every choice a conflict may be resolved with, then either every immediate transition
+    (Constant(0) delay) is output or any single timed transition is. Every order of
+    timed outputs is taken, so the states include every state of the simulation. A state
+    with nothing in progress is dead. When a new state covers a state on its path, having
+    at least as many tokens everywhere and more somewhere, the grown places and loads are
+    set to OMEGA, as in the Karp-Miller coverability tree, and from then on they are OMEGA
+    in every new state. Places with capacity and loads of transitions reserving room in
+    them are compared exactly. With OMEGA the states over-approximate the reachable ones,
+    e.g. reported unbounded places may be bounded when inhibitor arcs or priorities hold
+    them back, and the exploration is not guaranteed to end, it stops incomplete at
+    max_states.
+
+    Parameters
+    ----------
+    model : Model
+        model whose net is explored
+    max_states : int
+        number of states after which the exploration stops incomplete
+    max_memory : int
+        number of states kept in memory, further states are spilled into an sqlite file
+    spill : Optional[str]
+        file of spilled states, a temporary file when None, removed after exploration
+    workers : int
+        number of processes finding successors of the states of a level
+    max_dead : int
+        number of dead markings given in the result
+
+    Returns
+    -------
+    StateSpace
+        numbers of states, transitions between them and dead states, unbounded elements
+    """
+    net = model.net
+    skeleton = net.skeleton()
+    places = len(net.places)
+
+    marking = list(net.initial_marking)
+    for p in net.sinks:
+        marking[p] = 0
+    store = MarkingStore(max_memory, spill)
+    level = []
+    for state in _input_round(net, tuple(marking), (0,) * len(net.transitions)):
+        number = store.add(_pack(state), -1)
+        if number is not None:
+            level.append(number)
+
+    edges, depth, dead, dead_markings, complete = 0, 0, 0, [], True
+    omega: set[int] = set()
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        while level and complete:
+            states = [_unpack(store.get(number)[0]) for number in level]
+            if executor is None:
+                successors = [_successors(net, places, state) for state in states]
+            else:
+                chunk = -(-len(states) // (workers * 4))
+                tasks = [(skeleton, places, states[i:i + chunk]) for i in range(0, len(states), chunk)]
+                successors = [s for result in executor.map(_successors_chunk, tasks) for s in result]
+
+            next_level = []
+            for number, state, targets in zip(level, states, successors):
+                if not targets:
+                    dead += 1
+                    if len(dead_markings) < max_dead:
+                        dead_markings.append({net.places[p].name: n for p, n in enumerate(state[:places])
+                                              if p not in net.sinks})
+                for target in targets:
+                    edges += 1
+                    target = _accelerate(store, number, target, net, places)
+                    omega.update(k for k, n in enumerate(target) if n == OMEGA)
+                    # an element found unbounded is taken as unbounded in every state, so
+                    # finite variants of it reached on other paths do not multiply the states
+                    target = tuple(OMEGA if k in omega else n for k, n in enumerate(target))
+                    added = store.add(_pack(target), number)
+                    if added is not None:
+                        next_level.append(added)
+                        if len(store) >= max_states:
+                            complete = False
+                            break
+                if not complete:
+                    break
+            level = next_level
+            depth += 1
+        spilled = store.spilled
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        store.close()
+
+    return StateSpace(
+        len(store), edges, depth, dead, dead_markings,
+        [net.places[k].name for k in sorted(omega) if k < places],
+        [net.transitions[k - places].name for k in sorted(omega) if k >= places],
+        [net.places[p].name for p in sorted(net.sinks)],
+        complete, spilled,
+    )
+
+
+def _pack(state: tuple[int, ...]) -> bytes:
+    """Pack a state into bytes of 32-bit integers"""
+    return array('i', state).tobytes()
+
+
+def _unpack(packed: bytes) -> tuple[int, ...]:
+    """Unpack a state packed with _pack"""
+    state = array('i')
+    state.frombytes(packed)
+    return tuple(state)
+
+
+def _accelerate(store: MarkingStore, parent: int, state: tuple[int, ...], net: CompiledNet,
+                places: int) -> tuple[int, ...]:
+    """
+    Set to OMEGA the elements that grew since a state on the path to parent the state covers
+
+    Only states without pending immediate transitions are compared, those that
+    have them are left at once whatever other tokens they hold. Places with
+    capacity and loads of transitions reserving room in them are bounded, they
+    must be equal.
+    """
+    if _vanishing(net, places, state):
+        return state
+    bounded = [p for p in range(places) if net.capacity[p] != float('inf')]
+    bounded += [places + i for i, row in enumerate(net.reserve) if row]
+    state = list(state)
+    number = parent
+    while number >= 0:
+        packed, number_parent = store.get(number)
+        ancestor = _unpack(packed)
+        if not _vanishing(net, places, ancestor) and all(n >= a for n, a in zip(state, ancestor)) and all(
+                state[k] == ancestor[k] for k in bounded):
+            for k, (n, a) in enumerate(zip(state, ancestor)):
+                if n > a:
+                    state[k] = OMEGA
+        number = number_parent
+    return tuple(state)
+
+
+def _vanishing(net: CompiledNet, places: int, state: tuple[int, ...]) -> bool:
+    """Check whether immediate transitions are pending in a state"""
+    return any(load and load != OMEGA and net.immediate[i] for i, load in enumerate(state[places:]))
+
+
+def _successors_chunk(task: tuple[CompiledNet, int, list[tuple[int, ...]]]) -> list[list[tuple[int, ...]]]:
+    """Find successors of a chunk of states in a worker process"""
+    net, places, states = task
+    return [_successors(net, places, state) for state in states]
+
+
+def _successors(net: CompiledNet, places: int, state: tuple[int, ...]) -> list[tuple[int, ...]]:
+    """Find states reached from a state by outputs of transitions followed by input rounds"""
+    marking, loads = state[:places], state[places:]
+    # immediate transitions input without end output whenever timed ones do
+    immediate = [i for i, load in enumerate(loads) if load and load != OMEGA and net.immediate[i]]
+    outputs = [immediate] if immediate else [[i] for i, load in enumerate(loads) if load]
+
+    successors = set()
+    for transitions in outputs:
+        next_marking, next_loads = list(marking), list(loads)
+        for i in transitions:
+            times = loads[i] if i in immediate else 1
+            if next_loads[i] != OMEGA:
+                next_loads[i] -= times
+            for p, k in net.post[i] + net.branches[i]:
+                if p not in net.sinks:
+                    next_marking[p] = min(OMEGA, next_marking[p] + k * times)
+        successors.update(_input_round(net, tuple(next_marking), tuple(next_loads)))
+    return sorted(successors)
+
+
+def _input_round(net: CompiledNet, marking: tuple[int, ...], loads: tuple[int, ...]) -> set[tuple[int, ...]]:
+    """Get states reached by inputting enabled transitions until none is enabled, taking every choice of conflicts"""
+    reached, stack, seen = set(), [(marking, loads)], set()
+    while stack:
+        marking, loads = stack.pop()
+        enabled = [i for i in range(len(loads)) if loads[i] != OMEGA and net.enabled_in(i, marking, loads)]
+        if not enabled:
+            reached.add(marking + loads)
+            continue
+        maximum = max(net.priority[i] for i in enabled)
+        enabled = [i for i in enabled if net.priority[i] == maximum]
+        if len(enabled) > 1:
+            enabled = [i for i in enabled if net.probability[i]]
+        for i in enabled:
+            next_marking, next_loads = list(marking), list(loads)
+            for p, k in net.pre[i]:
+                if next_marking[p] != OMEGA:
+                    next_marking[p] -= k
+            # a transition whose inputs never run out is input without end, unless it reserves room
+            if all(marking[p] == OMEGA for p, _ in net.pre[i]) and not net.reserve[i]:
+                next_loads[i] = OMEGA
+            else:
+                next_loads[i] += 1
+            key = (tuple(next_marking), tuple(next_loads))
+            if key not in seen:
+                seen.add(key)
+                stack.append(key)
+    return reached
+
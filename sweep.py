@@ -0,0 +1,186 @@
+from functools import partial
+from typing import Any, Callable, Optional
+from elements import Numeric
+from model import Model
+from parallel_runner import ParallelRunner
+from random_functions import RandomFunctions
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import random
+
+
+Point = dict[str, Any]
+
+
+def defaults(model_class: type[Model]) -> Point:
+    """Get default values of constructor parameters of the model class"""
+    return {
+        name: parameter.default
+        for name, parameter in inspect.signature(model_class).parameters.items()
+        if parameter.default is not inspect.Parameter.empty
+    }
+
+
+def full_factorial(levels: dict[str, list]) -> list[Point]:
+    """Get every combination of levels of the factors"""
+    return [dict(zip(levels, values)) for values in itertools.product(*levels.values())]
+
+
+def one_at_a_time(base: Point, levels: dict[str, list]) -> list[Point]:
+    """Get the base point followed by points varying one factor over its levels with others at base values"""
+    points = [dict(base)]
+    for name, values in levels.items():
+        for value in values:
+            points.append({**base, name: value})
+    return points
+
+
+def latin_hypercube(ranges: dict[str, tuple], n: int, seed: Optional[int] = None) -> list[Point]:
+    """
+    Get n points of a Latin hypercube design
+
+    The range of every factor is split into n strata of equal width and every
+    stratum is sampled once, strata of different factors are matched randomly.
+
+    Parameters
+    ----------
+    ranges : dict[str, tuple]
+        (low, high) or (low, high, transform) of every factor, values are integers
+        from low to high inclusive when low and high are integers, transform maps
+        a value to the parameter, e.g. a mean to a Distribution
+    n : int
+        number of points
+    seed : Optional[int]
+        seed of the design
+
+    Returns
+    -------
+    list[Point]
+        points of the design
+    """
+    rng = random.Random(seed)
+    points: list[Point] = [{} for _ in range(n)]
+    for name, (low, high, *transform) in ranges.items():
+        strata = list(range(n))
+        rng.shuffle(strata)
+        for point, stratum in zip(points, strata):
+            if isinstance(low, int) and isinstance(high, int):
+                value = low + int((stratum + rng.random()) / n * (high + 1 - low))
+            else:
+                value = low + (stratum + rng.random()) / n * (high - low)
+            point[name] = transform[0](value) if transform else value
+    return points
+
+
+class Sweep:
+    """
+    Simulation of a model class over points of constructor parameters with results cached on disk
+
+    Results are saved into the cache directory under the key of the model class,
+    the parameters, the seed and the simulation and warmup times, so a repeated
+    study only simulates new points. Every point is simulated with a seed derived
+    from the sweep's seed and its parameters, so its result does not depend on the
+    other points of the study.
+    """
+    def __init__(self,
+                 model_class: Callable[..., Model],
+                 sim_time: Numeric,
+                 warmup_time: Numeric = 0,
+                 seed: int = 0,
+                 cache: Optional[str] = 'sweep-cache',
+                 workers: Optional[int] = None) -> None:
+        """
+        Parameters
+        ----------
+        model_class : Callable[..., Model]
+            picklable callable building a model from parameters given as keywords, e.g. StandardModel
+        sim_time : Numeric
+            time of simulation after warmup if specified
+        warmup_time : Numeric
+            time of warmup, no warmup is performed when 0
+        seed : int
+            seed the seeds of points are derived from
+        cache : Optional[str]
+            directory of cached results, nothing is cached when None
+        workers : Optional[int]
+            number of processes simulating points, number of processors when None
+        """
+        self.model_class = model_class
+        self.sim_time = sim_time
+        self.warmup_time = warmup_time
+        self.seed = seed
+        self.cache = cache
+        self.workers = workers
+
+    def run(self, points: list[Point]) -> list[dict[str, float]]:
+        """
+        Get results of simulations at every point simulating only points missing in the cache
+
+        Parameters
+        ----------
+        points : list[Point]
+            constructor parameters of models by names, missing parameters take default values
+
+        Returns
+        -------
+        list[dict[str, float]]
+            simulation results in the order of points
+        """
+        keys = [self._key(point) for point in points]
+        results = [self._load(key) for key in keys]
+
+        missing = {}
+        for i, (key, result) in enumerate(zip(keys, results)):
+            if result is None:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            indices = [positions[0] for positions in missing.values()]
+            simulated = ParallelRunner(self.workers).run(
+                [partial(self.model_class, **points[i]) for i in indices],
+                self.sim_time,
+                self.warmup_time,
+                seeds=[self._point_seed(points[i]) for i in indices]
+            )
+            for (key, positions), result in zip(missing.items(), simulated):
+                self._save(key, result)
+                for i in positions:
+                    results[i] = result
+
+        return results
+
+    def _point_seed(self, point: Point) -> int:
+        """Get the seed of the point"""
+        return RandomFunctions.derive_seed(self.seed, self._name(), repr(sorted(point.items())))
+
+    def _name(self) -> str:
+        """Get the qualified name of the model class"""
+        return f"{self.model_class.__module__}.{getattr(self.model_class, '__qualname__', repr(self.model_class))}"
+
+    def _key(self, point: Point) -> str:
+        """Get the cache key of the point"""
+        data = repr((self._name(), sorted(point.items()), self.seed, self.sim_time, self.warmup_time))
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _load(self, key: str) -> Optional[dict[str, float]]:
+        """Get the cached result under key, None when missing"""
+        if self.cache is None:
+            return None
+        try:
+            with open(os.path.join(self.cache, key + '.json')) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _save(self, key: str, result: dict[str, float]) -> None:
+        """Cache the result under key"""
+        if self.cache is None:
+            return
+        os.makedirs(self.cache, exist_ok=True)
+        filename = os.path.join(self.cache, key + '.json')
+        with open(filename + '.tmp', 'w') as file:
+            json.dump(result, file)
+        os.replace(filename + '.tmp', filename)
@@ -0,0 +1,43 @@
+import math
+
+
+def mser(series: list[float], batch_size: int = 5) -> tuple[int, bool]:
+    """
+    Find the truncation point of the series with MSER, MSER-5 by default
+
+    The series is averaged in batches of batch_size and the truncation minimizes
+    the squared standard error of the mean of the remaining batch means.
+
+    Parameters
+    ----------
+    series : list[float]
+        observations in the order of time, e.g. means over consecutive intervals
+    batch_size : int
+        number of observations averaged into one batch
+
+    Returns
+    -------
+    tuple[int, bool]
+        number of observations to discard and whether the truncation point lies
+        in the first half of the series, otherwise the series is too short to trust it
+    """
+    m = len(series) // batch_size
+    if m < 4:
+        return 0, False
+    means = [sum(series[i * batch_size:(i + 1) * batch_size]) / batch_size for i in range(m)]
+
+    best, best_d = math.inf, 0
+    total = squares = 0.
+    # sums over the tail means[d:] are gathered from the end, the last two batches are never discarded
+    statistics = [math.inf] * m
+    for d in range(m - 1, -1, -1):
+        total += means[d]
+        squares += means[d] ** 2
+        n = m - d
+        if n >= 3:
+            statistics[d] = (squares - total * total / n) / (n * n)
+    for d in range(m - 2):
+        if statistics[d] < best:
+            best, best_d = statistics[d], d
+    return best_d * batch_size, best_d <= m // 2
+